@@ -0,0 +1,253 @@
+import asyncio
+import queue
+import threading
+
+import aiohttp
+
+from backend.cache import cache_key
+from backend.decoding import decode_response_async
+from backend.queries import board_params, trip_params
+from backend.rate_limit import ENDPOINT_PRIORITY, NORMAL, QuotaExceeded
+from backend.singleflight import async_flights
+from backend.transport import (
+    BASE_URL,
+    MAX_RETRY_AFTER,
+    RETRY_STATUSES,
+    backoff_delay,
+    retry_after,
+    timeout_for,
+)
+
+
+class AsyncResRobot:
+    """
+    An asyncio client for the ResRobot API, built on aiohttp.
+
+    It mirrors the request methods of `ResRobot` so that several independent
+    queries can be in flight at the same time. A page that needs N stops then
+    pays the latency of one round trip instead of N round trips in sequence.
+
+    Features:
+    - Same endpoints as `ResRobot`: trips, journey details, location info,
+      timetables and nearby stops.
+    - A semaphore bounding the number of concurrent requests.
+    - Batch helpers such as `gather_timetables` for fan-out queries.
+    - The same per-endpoint timeouts and jittered retry policy as the
+      synchronous transport.
+    - Optionally shares a `ResponseCache` with the synchronous client.
+    - Identical requests in flight at the same time share one upstream call.
+    - Optionally draws from the same `RateLimiter` as the synchronous client.
+
+    Synchronous code runs these coroutines through `run_sync`, which uses one
+    background event loop shared by the whole process.
+    """
+
+    def __init__(
+        self,
+        api_key,
+        base_url=BASE_URL,
+        concurrency=8,
+        max_retries=3,
+        cache=None,
+        limiter=None,
+    ):
+        self.api_key = api_key
+        self.cache = cache
+        self.limiter = limiter
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self._loop = None
+        self._session = None
+        self._semaphore = None
+
+    def _ensure_session(self):
+        """
+        Creates the aiohttp session and semaphore on first use. Both are bound
+        to the running event loop, so they are recreated if the loop changes.
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.concurrency, keepalive_timeout=30
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={"Accept": "application/json"},
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._loop = loop
+        return self._session
+
+    async def fetch(self, endpoint: str, params: dict, priority=None):
+        """Sends a GET request to an endpoint and returns the decoded JSON."""
+        if self.cache is not None:
+            cached = self.cache.get(endpoint, params)
+            if cached is not None:
+                return cached
+
+        key = (self.base_url, cache_key(endpoint, params))
+        return await async_flights.do(
+            key, lambda: self._fetch(endpoint, params, priority)
+        )
+
+    async def _fetch(self, endpoint: str, params: dict, priority=None):
+        if self.limiter is not None:
+            if priority is None:
+                priority = ENDPOINT_PRIORITY.get(endpoint, NORMAL)
+            try:
+                await self.limiter.acquire_async(priority)
+            except QuotaExceeded as err:
+                print(f"Request to {endpoint} shed: {err}")
+                return None
+
+        data = await self._request(endpoint, params)
+        if self.cache is not None:
+            self.cache.set(endpoint, params, data)
+        return data
+
+    async def _request(self, endpoint: str, params: dict):
+        session = self._ensure_session()
+        url = f"{self.base_url}/{endpoint}"
+        params = {**params, "format": "json", "accessId": self.api_key}
+        connect, read = timeout_for(endpoint)
+        timeout = aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                last_attempt = attempt == self.max_retries
+                delay = None
+                try:
+                    async with session.get(
+                        url, params=params, timeout=timeout
+                    ) as response:
+                        delay = retry_after(response.headers.get("Retry-After"))
+                        retry = (
+                            response.status in RETRY_STATUSES
+                            and not last_attempt
+                            and (delay is None or delay <= MAX_RETRY_AFTER)
+                        )
+                        if not retry:
+                            response.raise_for_status()
+                            return await decode_response_async(endpoint, response)
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as err:
+                    if last_attempt:
+                        print(f"Network or HTTP error: {err}")
+                        return None
+                except (aiohttp.ClientError, ValueError) as err:
+                    print(f"Network or HTTP error: {err}")
+                    return None
+
+                await asyncio.sleep(
+                    delay if delay is not None else backoff_delay(attempt)
+                )
+
+    async def trips(
+        self,
+        origin_id,
+        destination_id,
+        passlist=True,
+        date=None,
+        time=None,
+        context=None,
+        priority=None,
+    ):
+        params = trip_params(origin_id, destination_id, passlist, date, time, context)
+        return await self.fetch("trip", params, priority=priority)
+
+    async def journey_detail(self, ref):
+        return await self.fetch("journeyDetail", {"id": ref})
+
+    async def get_location_info(self, location):
+        return await self.fetch("location.name", {"input": location})
+
+    async def get_timetable(self, location_id, board_type="departure", **window):
+        endpoint = "departureBoard" if board_type == "departure" else "arrivalBoard"
+        return await self.fetch(endpoint, board_params(location_id, **window))
+
+    async def get_nearby_stops(self, lat, lon, radius=1000):
+        params = {"originCoordLat": lat, "originCoordLong": lon, "r": radius}
+        return await self.fetch("location.nearbystops", params)
+
+    async def gather_timetables(self, location_ids, board_type="departure", **window):
+        """Fetches the timetables of many stops concurrently, in input order."""
+        return await asyncio.gather(
+            *(
+                self.get_timetable(location_id, board_type, **window)
+                for location_id in location_ids
+            )
+        )
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+_loop = None
+_loop_lock = threading.Lock()
+_clients = {}
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """Starts the process-wide event loop thread on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_loop.run_forever, name="resrobot-aio", daemon=True
+            ).start()
+        return _loop
+
+
+def as_completed_sync(coros):
+    """
+    Runs coroutines concurrently on the shared background loop and yields
+    their results in the calling thread as each one finishes.
+    """
+    done = queue.Queue()
+    futures = [
+        asyncio.run_coroutine_threadsafe(coro, _background_loop()) for coro in coros
+    ]
+    for future in futures:
+        future.add_done_callback(done.put)
+    for _ in futures:
+        yield done.get().result()
+
+
+def submit(coro):
+    """
+    Schedules a coroutine on the shared background loop without waiting for
+    it. Returns a `concurrent.futures.Future`; cancelling it cancels the
+    coroutine.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop())
+
+
+def run_sync(coro):
+    """
+    Runs a coroutine on the shared background loop and blocks until it is
+    done. Safe to call from Streamlit script threads, which have no loop.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result()
+
+
+async def gather_all(coros):
+    """Awaits coroutines concurrently and returns their results in order."""
+    return await asyncio.gather(*coros)
+
+
+def get_async_client(
+    api_key, base_url=BASE_URL, cache=None, limiter=None
+) -> AsyncResRobot:
+    """
+    Returns the shared `AsyncResRobot` for an API key, base URL, cache and
+    limiter, so every rerun reuses the same aiohttp connection pool.
+    """
+    key = (api_key, base_url, id(cache), id(limiter))
+    with _loop_lock:
+        if key not in _clients:
+            _clients[key] = AsyncResRobot(
+                api_key, base_url=base_url, cache=cache, limiter=limiter
+            )
+        return _clients[key]
@@ -0,0 +1,195 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import urlencode
+
+# Time to live in seconds per endpoint. Stop names and coordinates hardly
+# ever change, while departure boards are stale after half a minute.
+TTL_POLICIES = {
+    "location.name": 3 * 24 * 3600,
+    "location.nearbystops": 24 * 3600,
+    "departureBoard": 30,
+    "arrivalBoard": 30,
+    "trip": 180,
+    "journeyDetail": 300,
+}
+DEFAULT_TTL = 60
+
+# Parameters that never go into a stored key.
+EXCLUDED_PARAMS = frozenset({"accessId", "format"})
+
+
+def cache_key(endpoint: str, params: dict) -> str:
+    """
+    Builds a stable cache key from an endpoint and its query parameters.
+    The access key is left out, so it is never written to the cache.
+    """
+    items = sorted(
+        (name, str(value))
+        for name, value in params.items()
+        if name not in EXCLUDED_PARAMS
+    )
+    return f"{endpoint}?{urlencode(items)}"
+
+
+class MemoryCache:
+    """
+    In-memory LRU cache backend with per-entry expiry. When more than
+    `max_entries` are stored, the least recently used entry is evicted.
+    """
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """
+    On-disk cache backend in a SQLite file, so cached responses survive
+    restarts of the dashboard. Values are stored as JSON. When more than
+    `max_entries` are stored, expired entries are purged first and then the
+    least recently used ones.
+    """
+
+    def __init__(self, path, max_entries=20000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE responses SET accessed = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + ttl, now),
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+            if count > self.max_entries:
+                self._conn.execute("DELETE FROM responses WHERE expires < ?", (now,))
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    "SELECT key FROM responses ORDER BY accessed ASC LIMIT "
+                    "MAX(0, (SELECT COUNT(*) FROM responses) - ?))",
+                    (self.max_entries,),
+                )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+class ResponseCache:
+    """
+    Endpoint-aware cache for ResRobot responses.
+
+    Features:
+    - Per-endpoint TTLs (see `TTL_POLICIES`).
+    - Pluggable backends: `MemoryCache` (LRU) or `SQLiteCache` (persistent).
+    - Hit and miss counters for monitoring.
+    - Keys never contain the access key.
+    """
+
+    def __init__(self, backend=None, ttls=None):
+        self.backend = backend if backend is not None else MemoryCache()
+        self.ttls = {**TTL_POLICIES, **(ttls or {})}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, endpoint: str, params: dict):
+        value = self.backend.get(cache_key(endpoint, params))
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, endpoint: str, params: dict, value):
+        if value is None:
+            return
+        ttl = self.ttls.get(endpoint, DEFAULT_TTL)
+        self.backend.set(cache_key(endpoint, params), value, ttl)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self.backend),
+        }
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache() -> ResponseCache:
+    """Returns the process-wide in-memory cache used when none is given."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache(MemoryCache())
+        return _default_cache
@@ -1,6 +1,26 @@
 import requests
 import streamlit as st
 
+from backend.async_client import gather_all, get_async_client, run_sync
+from backend.cache import cache_key, get_default_cache
+from backend.decoding import decode_response
+from backend.models import (
+    parse_arrivals,
+    parse_departures,
+    parse_stop_locations,
+    parse_trips,
+)
+from backend.queries import board_params, trip_params
+from backend.rate_limit import (
+    ENDPOINT_PRIORITY,
+    NORMAL,
+    QuotaExceeded,
+    get_default_limiter,
+)
+from backend.singleflight import flights
+from backend.stop_store import get_default_stop_store
+from backend.transport import get_transport
+
 
 class ResRobot:
     """
@@ -14,12 +34,35 @@ class ResRobot:
     - Retrieve location information based on a place name.
     - Get departure and arrival timetables for a specific stop.
     - Find nearby stops based on GPS coordinates.
+    - Run several queries concurrently through `AsyncResRobot`.
+    - Typed variants (`search_trips`, `find_stops`, `departures`, `arrivals`,
+      `nearby_stops`) returning the records in `backend.models`.
 
+    All requests go through the shared pooled transport in `backend.transport`
+    and responses are cached per endpoint (see `backend.cache`). Upstream calls
+    draw from a token-bucket limiter guarding the access key's quota, where
+    trips and departure boards take priority over background requests.
     API key is required and should be stored in `secrets.toml`.
     """
 
-    def __init__(self, api_key=None):
-        """Initializes ResRobot with an API key."""
+    def __init__(
+        self,
+        api_key=None,
+        transport=None,
+        cache=None,
+        limiter=None,
+        base_url=None,
+        stop_store=None,
+    ):
+        """
+        Initializes ResRobot with an API key, an HTTP transport, a response
+        cache, a rate limiter and a stop store. Without a cache, limiter or
+        store, the process-wide defaults are used. Every stop returned by the
+        typed methods is harvested into the store. `base_url` points the
+        client at another server, such as the local stand-in in
+        `utils/mock_server.py`; it defaults to the RESROBOT_BASE_URL
+        environment variable or the real API.
+        """
         self.api_key = api_key or st.secrets["api"]["API_KEY"]
 
         if not self.api_key:
@@ -27,43 +70,135 @@ class ResRobot:
                 "API_KEY is missing! Make sure it is defined in the secrets.toml file."
             )
 
-    def _make_request(self, url: str):
-        """Private method to send HTTP requests and handle errors."""
+        self.transport = transport or get_transport(base_url)
+        self.cache = cache if cache is not None else get_default_cache()
+        self.limiter = limiter if limiter is not None else get_default_limiter()
+        self.stop_store = (
+            stop_store if stop_store is not None else get_default_stop_store()
+        )
+
+    @property
+    def aio(self):
+        """The shared `AsyncResRobot` for this API key and base URL."""
+        return get_async_client(
+            self.api_key,
+            base_url=self.transport.base_url,
+            cache=self.cache,
+            limiter=self.limiter,
+        )
+
+    def gather(self, *coros):
+        """
+        Runs coroutines from `self.aio` concurrently and returns their results
+        in order, e.g. `gather(aio.get_timetable(a), aio.get_timetable(b))`.
+        """
+        return run_sync(gather_all(coros))
+
+    def usage(self) -> dict:
+        """Returns quota usage and cache statistics for monitoring."""
+        return {"quota": self.limiter.usage(), "cache": self.cache.stats()}
+
+    def gather_timetables(self, location_ids, board_type="departure", **window):
+        return run_sync(self.aio.gather_timetables(location_ids, board_type, **window))
+
+    def _make_request(self, endpoint: str, params: dict, priority=None):
+        """
+        Private method to send HTTP requests and handle errors. Identical
+        requests made concurrently, e.g. from several browser sessions, share
+        a single upstream call. The priority defaults to the endpoint's entry
+        in `ENDPOINT_PRIORITY`.
+        """
+        cached = self.cache.get(endpoint, params)
+        if cached is not None:
+            return cached
+
+        key = (self.transport.base_url, cache_key(endpoint, params))
+        return flights.do(key, lambda: self._fetch(endpoint, params, priority))
+
+    def _fetch(self, endpoint: str, params: dict, priority=None):
+        if priority is None:
+            priority = ENDPOINT_PRIORITY.get(endpoint, NORMAL)
+        query = {**params, "format": "json", "accessId": self.api_key}
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as err:
+            self.limiter.acquire(priority)
+            response = self.transport.get(endpoint, query, stream=True)
+            data = decode_response(endpoint, response)
+        except QuotaExceeded as err:
+            print(f"Request to {endpoint} shed: {err}")
+            return None
+        except (requests.exceptions.RequestException, ValueError) as err:
             print(f"Network or HTTP error: {err}")
             return None
 
-    def trips(self, origin_id, destination_id):
-        url = (
-            f"https://api.resrobot.se/v2.1/trip?"
-            f"format=json&originId={origin_id}&destId={destination_id}"
-            f"&passlist=true&showPassingPoints=true&accessId={self.api_key}"
-        )
-        return self._make_request(url)
+        self.cache.set(endpoint, params, data)
+        return data
+
+    def trips(
+        self,
+        origin_id,
+        destination_id,
+        passlist=True,
+        date=None,
+        time=None,
+        context=None,
+    ):
+        """
+        Searches trips between two stops. The response only keeps the fields
+        listed in `backend.decoding.TRIP_FIELDS`. With `passlist=False` the
+        legs come without intermediate stops, which `journey_detail` can
+        fetch later for the legs that need them. `date` and `time` set the
+        earliest departure, and `context` takes a scroll context (`scrF`)
+        from an earlier response to page forward.
+        """
+        params = trip_params(origin_id, destination_id, passlist, date, time, context)
+        return self._make_request("trip", params)
+
+    def journey_detail(self, ref):
+        """Fetches the full stop list of a journey by its JourneyDetailRef."""
+        return self._make_request("journeyDetail", {"id": ref})
 
     def get_location_info(self, location):
-        url = (
-            f"https://api.resrobot.se/v2.1/location.name?"
-            f"input={location}&format=json&accessId={self.api_key}"
-        )
-        return self._make_request(url)
+        return self._make_request("location.name", {"input": location})
 
-    def get_timetable(self, location_id, board_type="departure"):
+    def get_timetable(self, location_id, board_type="departure", **window):
+        """
+        Fetches a departure or arrival board. `window` takes the `date`,
+        `time`, `duration`, `max_journeys` and `products` of
+        `backend.queries.board_params`, so only what is shown is downloaded.
+        """
         endpoint = "departureBoard" if board_type == "departure" else "arrivalBoard"
-        url = (
-            f"https://api.resrobot.se/v2.1/{endpoint}?"
-            f"id={location_id}&format=json&accessId={self.api_key}"
-        )
-        return self._make_request(url)
+        return self._make_request(endpoint, board_params(location_id, **window))
 
     def get_nearby_stops(self, lat, lon, radius=1000):
-        url = (
-            f"https://api.resrobot.se/v2.1/location.nearbystops?"
-            f"originCoordLat={lat}&originCoordLong={lon}&r={radius}"
-            f"&format=json&accessId={self.api_key}"
+        params = {"originCoordLat": lat, "originCoordLong": lon, "r": radius}
+        return self._make_request("location.nearbystops", params)
+
+    def search_trips(
+        self, origin_id, destination_id, passlist=True, date=None, time=None
+    ):
+        trips = parse_trips(
+            self.trips(origin_id, destination_id, passlist, date=date, time=time)
         )
-        return self._make_request(url)
+        self.stop_store.harvest(
+            stop
+            for trip in trips
+            for leg in trip.legs
+            for stop in (leg.origin, *leg.stops, leg.destination)
+        )
+        return trips
+
+    def find_stops(self, location):
+        stops = parse_stop_locations(self.get_location_info(location))
+        self.stop_store.harvest(stops)
+        return stops
+
+    def departures(self, location_id, **window):
+        return parse_departures(self.get_timetable(location_id, "departure", **window))
+
+    def arrivals(self, location_id, **window):
+        return parse_arrivals(self.get_timetable(location_id, "arrival", **window))
+
+    def nearby_stops(self, lat, lon, radius=1000):
+        stops = parse_stop_locations(self.get_nearby_stops(lat, lon, radius))
+        self.stop_store.harvest(stops)
+        return stops
@@ -0,0 +1,93 @@
+import json
+
+# Fields read from trip responses by TripPlanner and plot_maps: trips, legs,
+# their origin/destination, pass lists and stop names, ids, coordinates and
+# times. Everything else (Notes, Polyline, ServiceDays, track info, ...) is
+# dropped before the response is cached.
+TRIP_FIELDS = frozenset(
+    {
+        "Trip",
+        "LegList",
+        "Leg",
+        "Origin",
+        "Destination",
+        "Stops",
+        "Stop",
+        "JourneyDetailRef",
+        "ref",
+        "Product",
+        "operator",
+        "name",
+        "extId",
+        "lat",
+        "lon",
+        "date",
+        "time",
+        "rtDate",
+        "rtTime",
+        "arrDate",
+        "arrTime",
+        "depDate",
+        "depTime",
+        "rtArrDate",
+        "rtArrTime",
+        "rtDepDate",
+        "rtDepTime",
+        "routeIdx",
+        "type",
+        "direction",
+        "cancelled",
+        "duration",
+        "ctxRecon",
+        "scrB",
+        "scrF",
+    }
+)
+
+# Endpoints whose responses are pruned down to `TRIP_FIELDS`.
+PRUNED_ENDPOINTS = frozenset({"trip", "journeyDetail"})
+
+CHUNK_SIZE = 64 * 1024
+
+
+def prune_trip(data: dict) -> dict:
+    """
+    Deletes every key outside `TRIP_FIELDS` from a decoded trip response, in
+    place, so the cache only keeps what is read from it.
+
+    This runs after `json.loads` rather than as its `object_hook`: the hook
+    made parsing about 60% slower for a smaller transient peak, while the
+    cached tree is as small either way.
+    """
+    pending = [data]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, dict):
+            for key in node.keys() - TRIP_FIELDS:
+                del node[key]
+            pending.extend(node.values())
+        elif isinstance(node, list):
+            pending.extend(node)
+    return data
+
+
+def decode_response(endpoint: str, response) -> dict:
+    """
+    Decodes a streamed `requests` response. The body is read in chunks into
+    one buffer and parsed once complete; nothing is parsed incrementally.
+    Trip and journey detail responses are then pruned to `TRIP_FIELDS`.
+    """
+    body = bytearray()
+    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+        body += chunk
+    data = json.loads(body)
+    return prune_trip(data) if endpoint in PRUNED_ENDPOINTS else data
+
+
+async def decode_response_async(endpoint: str, response) -> dict:
+    """The aiohttp version of `decode_response`."""
+    body = bytearray()
+    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+        body += chunk
+    data = json.loads(body)
+    return prune_trip(data) if endpoint in PRUNED_ENDPOINTS else data
@@ -0,0 +1,152 @@
+"""
+Delay statistics over typed board frames (see `backend.frames`).
+
+A delay is the realtime minus the scheduled timestamp, in minutes, and is
+only known for events with a realtime time. Cancelled events count towards
+the cancellation rate but not towards the delay statistics.
+
+All groups are aggregated at once: events are sorted by (group, delay) with
+one `lexsort`, counts and sums come from `np.bincount`, and each quantile is
+read from the sorted delays at its interpolated position within each group.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from backend.frames import CATEGORIES
+
+QUANTILES = {"p50": 0.5, "p90": 0.9, "p99": 0.99}
+
+# The column of each grouping; "hour" is the hour of the scheduled time.
+GROUPS = {"line": "line", "operator": "operator", "stop": "stop_name", "hour": None}
+
+# Identifies one event across snapshots of the same board.
+_EVENT_KEY = ["journey_ref", "line", "scheduled", "stop_id"]
+_STATE = _EVENT_KEY + ["realtime", "cancelled"]
+
+
+def delay_minutes(frame: pd.DataFrame) -> np.ndarray:
+    """Realtime minus scheduled minutes of each event, NaN without realtime."""
+    delay = (frame["realtime"] - frame["scheduled"]).to_numpy()
+    minutes = delay.astype("timedelta64[s]").astype(float) / 60.0
+    minutes[np.isnat(delay)] = np.nan
+    return minutes
+
+
+def _group_codes(frame: pd.DataFrame, by: str):
+    """Group number of each event (-1 when unknown) and the group labels."""
+    if by == "hour":
+        hours = frame["scheduled"].dt.hour.to_numpy(dtype=float, na_value=np.nan)
+        return np.where(np.isnan(hours), -1, hours).astype(np.int64), pd.RangeIndex(24)
+    column = frame[GROUPS[by]]
+    return column.cat.codes.to_numpy().astype(np.int64), column.cat.categories
+
+
+def summarize(frame: pd.DataFrame, by: str = "line") -> pd.DataFrame:
+    """
+    Delay statistics per `by` ("line", "operator", "stop" or "hour"):
+    number of events, number with a realtime time, mean and quantile delays
+    in minutes, and the share of cancelled events.
+    """
+    codes, labels = _group_codes(frame, by)
+    size = len(labels)
+    delay = delay_minutes(frame)
+    cancelled = frame["cancelled"].to_numpy(dtype=bool, na_value=False)
+
+    known = codes >= 0
+    events = np.bincount(codes[known], minlength=size)
+    cancellations = np.bincount(codes[known & cancelled], minlength=size)
+
+    timed = known & ~cancelled & ~np.isnan(delay)
+    groups, delays = codes[timed], delay[timed]
+    counts = np.bincount(groups, minlength=size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        stats = {
+            "events": events,
+            "timed": counts,
+            "mean": np.bincount(groups, weights=delays, minlength=size) / counts,
+        }
+
+        order = np.lexsort((delays, groups))
+        ordered = delays[order]
+        starts = np.cumsum(counts) - counts
+        last = np.maximum(counts - 1, 0)
+        for name, quantile in QUANTILES.items():
+            position = quantile * last
+            low = np.floor(position).astype(np.int64)
+            high = np.ceil(position).astype(np.int64)
+            if len(ordered):
+                below = ordered[np.minimum(starts + low, len(ordered) - 1)]
+                above = ordered[np.minimum(starts + high, len(ordered) - 1)]
+                value = below + (above - below) * (position - low)
+            else:
+                value = np.zeros(size)
+            stats[name] = np.where(counts > 0, value, np.nan)
+        stats["cancel_rate"] = cancellations / events
+
+    summary = pd.DataFrame(stats, index=pd.Index(labels, name=by))
+    return summary[summary["events"] > 0]
+
+
+class DelayTracker:
+    """
+    Delay statistics of one board, updated as new snapshots arrive.
+
+    Features:
+    - `update` merges a snapshot into the events seen so far, keeping the
+      latest state of each event, and bumps `version` only if it changed.
+    - `summary` is recomputed once per version and grouping and memoized.
+    """
+
+    def __init__(self):
+        self.events = None
+        self.version = 0
+        self._summaries = {}
+        self._lock = threading.Lock()
+
+    def update(self, frame: pd.DataFrame) -> bool:
+        """Merges a typed board frame. Returns whether anything changed."""
+        if frame.empty:
+            return False
+        with self._lock:
+            if self.events is None:
+                merged = frame.drop_duplicates(_EVENT_KEY, keep="last")
+            else:
+                merged = pd.concat([self.events, frame], ignore_index=True)
+                if merged.duplicated(_STATE).tail(len(frame)).all():
+                    return False
+                merged = merged.drop_duplicates(_EVENT_KEY, keep="last")
+                # Concatenating categoricals with different categories
+                # leaves object columns.
+                for column in CATEGORIES:
+                    if merged[column].dtype != "category":
+                        merged[column] = merged[column].astype("category")
+            self.events = merged.reset_index(drop=True)
+            self.version += 1
+            self._summaries.clear()
+            return True
+
+    def summary(self, by: str = "line") -> pd.DataFrame:
+        with self._lock:
+            if self.events is None:
+                return pd.DataFrame()
+            if by not in self._summaries:
+                self._summaries[by] = summarize(self.events, by)
+            return self._summaries[by]
+
+
+_trackers = {}
+_trackers_lock = threading.Lock()
+
+
+def get_delay_tracker(station_id, board: str, date: str) -> DelayTracker:
+    """The process-wide tracker of one board of a station on `date`."""
+    with _trackers_lock:
+        for key in [key for key in _trackers if key[2] != date]:
+            del _trackers[key]
+        key = (str(station_id), board, date)
+        if key not in _trackers:
+            _trackers[key] = DelayTracker()
+        return _trackers[key]
@@ -0,0 +1,208 @@
+"""
+Snapshot of one stop's departure board, with every departure time parsed
+once into an array of epoch minutes.
+
+Times are taken from the realtime fields when the API has them and from the
+timetable otherwise, and always together with their date, so departures
+after midnight count as tomorrow. Each snapshot remembers the window it was
+requested with (see `backend.queries.board_params`), so `TimeTable` can
+serve a narrower view from a wider snapshot without fetching again.
+
+`MergedBoard` combines the boards of a station group, such as the stops of a
+large hub, into one board ordered by departure time.
+"""
+
+import heapq
+import time as clock
+from datetime import datetime
+from itertools import islice, takewhile
+
+import numpy as np
+
+from backend.models import Departure, parse_departures
+
+
+def _clock_minutes(times: list[str]) -> np.ndarray:
+    """Minutes after midnight of "HH:MM[:SS]" strings, parsed as one array."""
+    if not times:
+        return np.empty(0, dtype=np.int64)
+    text = "".join(value[:5] for value in times).encode("ascii")
+    digits = np.frombuffer(text, dtype=np.uint8).reshape(len(times), 5)
+    digits = digits.astype(np.int64) - ord("0")
+    return (digits[:, 0] * 10 + digits[:, 1]) * 60 + digits[:, 3] * 10 + digits[:, 4]
+
+
+def epoch_minutes(dates: list[str], times: list[str]) -> np.ndarray:
+    """Minutes since the epoch of local date and time strings."""
+    days = np.array(dates, dtype="datetime64[D]").astype(np.int64)
+    return days * 1440 + _clock_minutes(times)
+
+
+# The board length the API uses when a request has no `duration`.
+DEFAULT_DURATION = 60
+
+
+def covers(have: dict, want: dict) -> bool:
+    """
+    Whether a board fetched with window `have` holds every departure of a
+    board requested with window `want`.
+    """
+    if any(have.get(key) != want.get(key) for key in ("date", "time", "products")):
+        return False
+    have_duration = have.get("duration") or DEFAULT_DURATION
+    if have_duration < (want.get("duration") or DEFAULT_DURATION):
+        return False
+    have_max, want_max = have.get("max_journeys"), want.get("max_journeys")
+    return have_max is None or (want_max is not None and have_max >= want_max)
+
+
+def journey_key(departure: Departure):
+    """
+    Identifies the journey a departure belongs to. A journey that calls at
+    several stops of a group has the same key at each of them.
+    """
+    if departure.journey_ref:
+        return departure.journey_ref
+    return (departure.line, departure.direction, departure.date, departure.time)
+
+
+def now_minutes(now: datetime | None = None) -> int:
+    """The current local time in the epoch minutes of `epoch_minutes`."""
+    now = now or datetime.now()
+    return int(np.datetime64(now.replace(tzinfo=None), "m").astype(np.int64))
+
+
+class DepartureBoard:
+    """
+    Immutable snapshot of a departure board.
+
+    Features:
+    - One fetch and one vectorized time parse per snapshot.
+    - `minutes_left` for all departures at once.
+    - `upcoming` keeps the N soonest with a partial sort.
+    - `within` returns the departures of the next hour (or any window).
+    """
+
+    def __init__(
+        self, stop_id, departures: list[Departure], fetched_at=None, window=None
+    ):
+        self.stop_id = stop_id
+        self.window = window or {}
+        self.fetched_at = fetched_at if fetched_at is not None else clock.time()
+
+        fallback = datetime.now().strftime("%Y-%m-%d")
+        self.departures = [dep for dep in departures if dep.rt_time or dep.time]
+        self.minutes = epoch_minutes(
+            [dep.rt_date or dep.date or fallback for dep in self.departures],
+            [dep.rt_time or dep.time for dep in self.departures],
+        )
+        self._order = None
+
+    @classmethod
+    def fetch(cls, resrobot, stop_id, **window) -> "DepartureBoard":
+        return cls(stop_id, resrobot.departures(stop_id, **window), window=window)
+
+    def age(self) -> float:
+        return clock.time() - self.fetched_at
+
+    def __len__(self):
+        return len(self.departures)
+
+    def minutes_left(self, now=None) -> np.ndarray:
+        return self.minutes - now_minutes(now)
+
+    def upcoming(self, limit=20, now=None) -> list[tuple[Departure, int]]:
+        """The `limit` soonest departures that have not left, soonest first."""
+        left = self.minutes_left(now)
+        positions = np.flatnonzero(left >= 0)
+        if len(positions) > limit:
+            nearest = np.argpartition(left[positions], limit)[:limit]
+            positions = positions[nearest]
+        positions = positions[np.argsort(left[positions], kind="stable")]
+        return [(self.departures[pos], int(left[pos])) for pos in positions]
+
+    def within(self, minutes=60, now=None) -> list[tuple[Departure, int]]:
+        """Departures leaving in the next `minutes` minutes, soonest first."""
+        left = self.minutes_left(now)
+        positions = np.flatnonzero((left >= 0) & (left <= minutes))
+        positions = positions[np.argsort(left[positions], kind="stable")]
+        return [(self.departures[pos], int(left[pos])) for pos in positions]
+
+    def stream(self, tag=0, start=None):
+        """
+        Yields `(minute, tag, position, departure)` in departure order from
+        epoch minute `start` on, the input of the heap merge in `MergedBoard`.
+        """
+        if self._order is None:
+            self._order = np.argsort(self.minutes, kind="stable")
+        sorted_minutes = self.minutes[self._order]
+        first = 0 if start is None else np.searchsorted(sorted_minutes, start)
+        for position in self._order[first:]:
+            departure = self.departures[position]
+            yield int(self.minutes[position]), tag, int(position), departure
+
+
+class MergedBoard:
+    """
+    The departure boards of several stops merged into one.
+
+    Features:
+    - Fetches all boards concurrently, for the latency of one request.
+    - K-way merges them by departure time with a heap.
+    - Drops the repeated departures of a journey calling at several of the
+      stops, keeping the earliest.
+    - `upcoming` stops merging after N departures instead of sorting all.
+    """
+
+    def __init__(self, boards: list[DepartureBoard], window=None):
+        self.boards = boards
+        self.stop_id = tuple(board.stop_id for board in boards)
+        self.window = window or {}
+
+    @classmethod
+    def fetch(cls, resrobot, stop_ids, **window) -> "MergedBoard":
+        """
+        Fetches the boards of `stop_ids`, each with the same window. With
+        `max_journeys=N` the merged board still holds the N soonest
+        departures, since each of them is among the N soonest of its stop.
+        """
+        responses = resrobot.gather_timetables(stop_ids, "departure", **window)
+        return cls(
+            [
+                DepartureBoard(stop_id, parse_departures(data), window=window)
+                for stop_id, data in zip(stop_ids, responses)
+            ],
+            window=window,
+        )
+
+    def age(self) -> float:
+        return max((board.age() for board in self.boards), default=0.0)
+
+    def __len__(self):
+        return sum(len(board) for board in self.boards)
+
+    def _merged(self, start=None):
+        seen = set()
+        streams = [board.stream(tag, start) for tag, board in enumerate(self.boards)]
+        for minute, _, _, departure in heapq.merge(*streams):
+            key = journey_key(departure)
+            if key in seen:
+                continue
+            seen.add(key)
+            yield departure, minute
+
+    @property
+    def departures(self) -> list[Departure]:
+        return [departure for departure, _ in self._merged()]
+
+    def upcoming(self, limit=20, now=None) -> list[tuple[Departure, int]]:
+        now = now_minutes(now)
+        merged = self._merged(start=now)
+        return [(dep, minute - now) for dep, minute in islice(merged, limit)]
+
+    def within(self, minutes=60, now=None) -> list[tuple[Departure, int]]:
+        now = now_minutes(now)
+        merged = takewhile(
+            lambda item: item[1] - now <= minutes, self._merged(start=now)
+        )
+        return [(dep, minute - now) for dep, minute in merged]
@@ -0,0 +1,249 @@
+"""
+Local columnar store of the departure and arrival events seen by the
+collector (`utils/collector.py`).
+
+Events are appended as Parquet files to a hive-partitioned dataset with one
+directory per board, date and station, e.g.
+`board=departure/date=2025-03-14/station=740000002/part-....parquet`, so
+reading a station's day only opens the files of that partition. The date is
+the planned date of the event, so departures after midnight are filed under
+the next day.
+
+Every poll stores the events that are new or whose realtime state changed.
+Reading keeps the last observation of each journey.
+
+The planned times each poll covered are kept apart from the events, under
+`_polls/` (which dataset discovery skips, like every path starting with
+"_"), as merged minute intervals per partition. They tell an hour with no
+traffic from an hour the collector never polled.
+"""
+
+import json
+import os
+import threading
+import uuid
+from dataclasses import asdict, fields
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from backend.models import Arrival, Departure
+from utils.constants import EVENT_STORE_PATH
+
+PARTITIONING = ds.partitioning(
+    pa.schema(
+        [("board", pa.string()), ("date", pa.string()), ("station", pa.string())]
+    ),
+    flavor="hive",
+)
+
+SCHEMA = pa.schema(
+    [
+        ("line", pa.string()),
+        ("direction", pa.string()),
+        ("origin", pa.string()),
+        ("time", pa.string()),
+        ("rt_time", pa.string()),
+        ("rt_date", pa.string()),
+        ("stop_ext_id", pa.string()),
+        ("stop_name", pa.string()),
+        ("operator", pa.string()),
+        ("journey_ref", pa.string()),
+        ("cancelled", pa.bool_()),
+        ("observed", pa.timestamp("s")),
+        ("board", pa.string()),
+        ("date", pa.string()),
+        ("station", pa.string()),
+    ]
+)
+
+# The columns of each board, in the field order of its model.
+COLUMNS = {
+    "departure": [field.name for field in fields(Departure)],
+    "arrival": [field.name for field in fields(Arrival)],
+}
+
+# Identifies one journey's event at a stop; the planned time and date never
+# change between observations.
+_EVENT_KEY = ["journey_ref", "line", "date", "time"]
+
+
+def _merge(intervals) -> list[list[int]]:
+    """Overlapping or adjacent `[start, end)` intervals joined, in order."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _state(row: dict):
+    """An event as the tuple compared to find new and changed events."""
+    return tuple(row.get(column) for column in _EVENT_KEY) + (
+        row.get("rt_time"),
+        row.get("rt_date"),
+        row.get("cancelled"),
+    )
+
+
+class EventStore:
+    """
+    Partitioned Parquet dataset of board events.
+
+    Features:
+    - `append` writes only events that are new or changed since the last
+      observation, one file per partition and poll. The states it compares
+      against are only kept for the days polls still return.
+    - `read` pushes the board, station, date and time filters down to the
+      dataset, so only the matching partition is scanned.
+    - `record_poll` and `coverage` keep the planned minutes of each day the
+      polls of a board covered.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def _dataset(self):
+        return ds.dataset(
+            str(self.root), format="parquet", partitioning=PARTITIONING, schema=SCHEMA
+        )
+
+    def _seen_states(self, board, date, station) -> set:
+        partition = (board, date, station)
+        if partition not in self._seen:
+            frame = self._scan(board, station, date)
+            self._seen[partition] = {
+                _state(row) for row in frame.to_dict(orient="records")
+            }
+        return self._seen[partition]
+
+    def _forget_before(self, date):
+        """Drops the seen states of the partitions of days before `date`."""
+        for partition in [key for key in self._seen if key[1] < date]:
+            del self._seen[partition]
+
+    def append(self, board: str, station, events, observed) -> int:
+        """
+        Stores the `Departure` or `Arrival` records of one poll of a board.
+        Returns the number of events written.
+        """
+        station = str(station)
+        observed = pd.Timestamp(observed).floor("s").to_pydatetime()
+        events = list(events)
+        rows = []
+        with self._lock:
+            dates = [event.date for event in events if event.date]
+            if dates:
+                # Polls no longer return older days; a late one is rescanned.
+                self._forget_before(min(dates))
+            for event in events:
+                row = asdict(event)
+                if not row.get("date") or not row.get("time"):
+                    continue
+                seen = self._seen_states(board, row["date"], station)
+                state = _state(row)
+                if state in seen:
+                    continue
+                seen.add(state)
+                rows.append(
+                    {**row, "board": board, "station": station, "observed": observed}
+                )
+            if rows:
+                ds.write_dataset(
+                    pa.Table.from_pylist(rows, schema=SCHEMA),
+                    str(self.root),
+                    format="parquet",
+                    partitioning=PARTITIONING,
+                    basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+                    existing_data_behavior="overwrite_or_ignore",
+                )
+        return len(rows)
+
+    def _polls_path(self, board, station, date) -> Path:
+        return (
+            self.root / "_polls" / f"board={board}" / f"date={date}" / f"{station}.json"
+        )
+
+    def coverage(self, board: str, station, date: str) -> list[list[int]]:
+        """
+        The `[start, end)` minutes after midnight of `date` whose events of a
+        board the collector's polls returned, merged and in order.
+        """
+        path = self._polls_path(board, str(station), date)
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return []
+
+    def record_poll(self, board: str, station, start: datetime, end: datetime):
+        """
+        Records that a poll returned every event of a board planned in
+        `[start, end)`, split at midnight into the days it spans.
+        """
+        station = str(station)
+        with self._lock:
+            while start < end:
+                day = datetime.combine(start.date(), datetime.min.time())
+                stop = min(end, day + timedelta(days=1))
+                date = start.strftime("%Y-%m-%d")
+                minutes = [
+                    int((moment - day).total_seconds() // 60)
+                    for moment in (start, stop)
+                ]
+                intervals = _merge(self.coverage(board, station, date) + [minutes])
+                path = self._polls_path(board, station, date)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                # Written whole and renamed, so a reader never sees half a file.
+                temporary = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+                temporary.write_text(json.dumps(intervals), encoding="utf-8")
+                os.replace(temporary, path)
+                start = stop
+
+    def _scan(self, board, station, date, until=None) -> pd.DataFrame:
+        if not self.root.exists():
+            return pd.DataFrame(columns=SCHEMA.names)
+        condition = (
+            (ds.field("board") == board)
+            & (ds.field("station") == str(station))
+            & (ds.field("date") == date)
+        )
+        if until is not None:
+            condition &= ds.field("time") <= until
+        return self._dataset().to_table(filter=condition).to_pandas()
+
+    def read(self, board: str, station, date: str, until=None) -> pd.DataFrame:
+        """
+        The events of one board of a station on `date`, planned at or before
+        the time `until` ("HH:MM:SS") if given, in the columns of the board's
+        model and sorted by planned time. Each journey appears once, as last
+        observed.
+        """
+        frame = self._scan(board, station, date, until)
+        if frame.empty:
+            return pd.DataFrame(columns=COLUMNS[board])
+        frame = frame.sort_values("observed", kind="stable").drop_duplicates(
+            _EVENT_KEY, keep="last"
+        )
+        return frame.sort_values("time", kind="stable")[COLUMNS[board]].reset_index(
+            drop=True
+        )
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_default_event_store() -> EventStore:
+    """Returns the process-wide store in `EVENT_STORE_PATH`."""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = EventStore(EVENT_STORE_PATH)
+        return _default_store
@@ -0,0 +1,120 @@
+"""
+Hourly departure and arrival counts per station and day, kept up to date
+incrementally.
+
+Each update only counts the events the histogram has not seen before,
+identified by journey, and adds them with one `np.bincount`. Frames carrying
+the `attrs["version"]` already counted are skipped without looking at their
+rows, so a rerun with no new data costs nothing. The version is bumped only
+when a count changed, so anything derived from the histogram, such as the
+Data tab's graph, can be memoized on it.
+
+`hourly_matrix` counts many stations at once for the Data tab's heatmap.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+HOURS = 24
+
+
+def _event_keys(frame: pd.DataFrame) -> pd.Index:
+    """Journey refs of a typed board frame, or line and time without one."""
+    fallback = frame["line"].astype(str) + "|" + frame["scheduled"].astype(str)
+    return pd.Index(frame["journey_ref"].astype(object).fillna(fallback))
+
+
+def hourly_matrix(frames: list[pd.DataFrame]) -> np.ndarray:
+    """
+    Events per scheduled hour of many typed board frames, as a
+    `len(frames)` x 24 matrix counted with one `np.bincount`.
+    """
+    hours = [
+        frame["scheduled"].dt.hour.to_numpy(dtype=float, na_value=np.nan)
+        for frame in frames
+    ]
+    if not hours:
+        return np.zeros((0, HOURS), dtype=np.int64)
+    rows = np.repeat(np.arange(len(frames)), [len(part) for part in hours])
+    hours = np.concatenate(hours)
+    known = ~np.isnan(hours)
+    cells = rows[known] * HOURS + hours[known].astype(np.int64)
+    counts = np.bincount(cells, minlength=len(frames) * HOURS)
+    return counts.reshape(len(frames), HOURS)
+
+
+class HourlyHistogram:
+    """Counts of one board's events per scheduled hour."""
+
+    def __init__(self):
+        self.counts = np.zeros(HOURS, dtype=np.int64)
+        self._seen = pd.Index([], dtype=object)
+
+    def update(self, frame: pd.DataFrame) -> int:
+        """Counts the new events of a typed board frame. Returns how many."""
+        if frame.empty:
+            return 0
+        keys = _event_keys(frame)
+        new = ~keys.isin(self._seen) & ~keys.duplicated()
+        hours = frame["scheduled"].dt.hour.to_numpy(dtype=float, na_value=np.nan)
+        new &= ~np.isnan(hours)
+        if not new.any():
+            return 0
+        self.counts += np.bincount(hours[new].astype(np.int64), minlength=HOURS)
+        self._seen = self._seen.append(keys[new])
+        return int(new.sum())
+
+
+class StationHistogram:
+    """
+    Hourly departures and arrivals of one station on one day.
+
+    Features:
+    - `update` counts only events not seen by earlier updates, and skips
+      frames whose `attrs["version"]` it has already counted.
+    - `version` changes only when a count changed.
+    """
+
+    def __init__(self, station_id, date: str):
+        self.station_id = station_id
+        self.date = date
+        self.departures = HourlyHistogram()
+        self.arrivals = HourlyHistogram()
+        self.version = 0
+        self._counted = None
+        self._lock = threading.Lock()
+
+    def update(self, departures: pd.DataFrame, arrivals: pd.DataFrame) -> bool:
+        versions = (departures.attrs.get("version"), arrivals.attrs.get("version"))
+        with self._lock:
+            if None not in versions and versions == self._counted:
+                return False
+            self._counted = versions
+            added = self.departures.update(departures) + self.arrivals.update(arrivals)
+            if added:
+                self.version += 1
+            return bool(added)
+
+    def counts(self) -> tuple[np.ndarray, np.ndarray]:
+        with self._lock:
+            return self.departures.counts.copy(), self.arrivals.counts.copy()
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+
+def get_station_histogram(station_id, date: str) -> StationHistogram:
+    """
+    The process-wide histogram of a station on `date`. Histograms of other
+    dates are dropped.
+    """
+    with _histograms_lock:
+        for key in [key for key in _histograms if key[1] != date]:
+            del _histograms[key]
+        key = (str(station_id), date)
+        if key not in _histograms:
+            _histograms[key] = StationHistogram(station_id, date)
+        return _histograms[key]
@@ -0,0 +1,225 @@
+"""
+Live departure boards that are refreshed by polling and published as deltas.
+
+One `LiveBoard` per stop (or station group) is shared by every viewer in the
+process. Whichever viewer finds it due re-reads the board, diffs it against
+the previous snapshot by journey and records the delta under a new version.
+Each viewer keeps a `LiveView` with its own rows and version and only
+applies the deltas it has not seen yet.
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+
+import pandas as pd
+
+from backend.cache import TTL_POLICIES
+from backend.departure_board import DepartureBoard, MergedBoard, journey_key
+from backend.models import Departure
+
+
+@dataclass(frozen=True, slots=True)
+class BoardDelta:
+    version: int
+    added: tuple[Departure, ...] = ()
+    changed: tuple[Departure, ...] = ()
+    removed: tuple = ()
+
+    def __bool__(self):
+        return bool(self.added or self.changed or self.removed)
+
+
+def _realtime(departure: Departure):
+    return departure.rt_time, departure.rt_date, departure.cancelled
+
+
+def diff_boards(old, new, version) -> BoardDelta:
+    """
+    Departures added to, changed on and removed from a board, matched by
+    journey. A departure counts as changed when its realtime time or date
+    or its cancellation changed.
+    """
+    old_by_key = {journey_key(dep): dep for dep in old.departures} if old else {}
+    new_by_key = {journey_key(dep): dep for dep in new.departures}
+    return BoardDelta(
+        version=version,
+        added=tuple(dep for key, dep in new_by_key.items() if key not in old_by_key),
+        changed=tuple(
+            dep
+            for key, dep in new_by_key.items()
+            if key in old_by_key and _realtime(old_by_key[key]) != _realtime(dep)
+        ),
+        removed=tuple(key for key in old_by_key if key not in new_by_key),
+    )
+
+
+class LiveBoard:
+    """
+    A departure board kept up to date by polling.
+
+    Features:
+    - Polls at most every `min_interval` seconds, the lifetime of a cached
+      board, and doubles the interval up to `max_interval` while nothing
+      changes; any change resets it.
+    - Keeps the last snapshot and the recent deltas, so many viewers share
+      one poll and each catches up from its own version.
+    - Fetches outside the lock; viewers arriving during a poll go on with
+      the snapshot they have instead of waiting for it.
+    """
+
+    def __init__(
+        self,
+        resrobot,
+        stop_id,
+        min_interval=TTL_POLICIES["departureBoard"],
+        max_interval=240,
+        history=32,
+    ):
+        self.resrobot = resrobot
+        self.stop_id = stop_id
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.board = None
+        self.version = 0
+        self._deltas = deque(maxlen=history)
+        self._next_poll = 0.0
+        self._polling = False
+        self._lock = threading.Lock()
+
+    def _fetch(self):
+        if isinstance(self.stop_id, tuple):
+            return MergedBoard.fetch(self.resrobot, self.stop_id)
+        return DepartureBoard.fetch(self.resrobot, self.stop_id)
+
+    def poll(self) -> bool:
+        """Re-reads the board if a poll is due. Returns whether it changed."""
+        with self._lock:
+            if self._polling or time.monotonic() < self._next_poll:
+                return False
+            self._polling = True
+
+        board = None
+        try:
+            board = self._fetch()
+        finally:
+            with self._lock:
+                self._polling = False
+                changed = board is not None and self._apply(board)
+        return changed
+
+    def _apply(self, board) -> bool:
+        """Records a fetched board and schedules the next poll. Holds the lock."""
+        if not len(board) and self.board is not None and len(self.board):
+            # A failed request reads as an empty board; keep the last one.
+            board = self.board
+        delta = diff_boards(self.board, board, self.version + 1)
+        self.board = board
+        if delta:
+            self.version = delta.version
+            self._deltas.append(delta)
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * 2, self.max_interval)
+        self._next_poll = time.monotonic() + self.interval
+        return bool(delta)
+
+    def snapshot(self):
+        """The current board and its version, read together."""
+        with self._lock:
+            return self.board, self.version
+
+    def changes_since(self, version) -> list[BoardDelta] | None:
+        """
+        The deltas after `version`, oldest first, or None when some of them
+        are no longer kept and the viewer has to reload the whole board.
+        """
+        with self._lock:
+            if version == self.version:
+                return []
+            deltas = [delta for delta in self._deltas if delta.version > version]
+            if not deltas or deltas[0].version != version + 1:
+                return None
+            return deltas
+
+
+class LiveView:
+    """One viewer's rows of a `LiveBoard`, updated by applying deltas."""
+
+    def __init__(self, live: LiveBoard):
+        self.live = live
+        self.version = -1
+        self.rows = {}
+        self.changed = set()
+
+    def refresh(self) -> set:
+        """Polls the shared board and applies what changed since last time."""
+        self.live.poll()
+        deltas = self.live.changes_since(self.version)
+        if deltas is None:
+            board, version = self.live.snapshot()
+            if board is None:
+                # The first poll is still running in another session.
+                return set()
+            self.rows = {journey_key(dep): dep for dep in board.departures}
+            self.changed = set(self.rows)
+            self.version = version
+        else:
+            self.changed = set()
+            for delta in deltas:
+                for key in delta.removed:
+                    self.rows.pop(key, None)
+                    self.changed.discard(key)
+                for dep in delta.added + delta.changed:
+                    self.rows[journey_key(dep)] = dep
+                    self.changed.add(journey_key(dep))
+            if deltas:
+                self.version = deltas[-1].version
+        return self.changed
+
+    def frame(self) -> pd.DataFrame:
+        """
+        The rows still to depart, soonest first, with a `changed` column
+        marking those updated by the last refresh.
+        """
+        if not self.rows:
+            return pd.DataFrame()
+        board = DepartureBoard(None, list(self.rows.values()))
+        left = board.minutes_left()
+        frame = pd.DataFrame(
+            {
+                "Linje": [dep.line for dep in board.departures],
+                "Destination": [dep.direction for dep in board.departures],
+                "Avgångstid": [dep.time or "N/A" for dep in board.departures],
+                "Ny tid": [dep.rt_time or "" for dep in board.departures],
+                "Inställd": [dep.cancelled for dep in board.departures],
+                "Tid kvar (min)": left,
+                "changed": [
+                    journey_key(dep) in self.changed for dep in board.departures
+                ],
+            }
+        )
+        return frame[left >= 0].sort_values("Tid kvar (min)", kind="stable")
+
+
+# Most recently used boards kept for new viewers; a `LiveView` keeps its own
+# board alive after it is dropped here.
+MAX_BOARDS = 64
+
+_boards = OrderedDict()
+_boards_lock = threading.Lock()
+
+
+def get_live_board(resrobot, stop_id) -> LiveBoard:
+    """The process-wide `LiveBoard` of a stop id or a list of stop ids."""
+    key = tuple(stop_id) if isinstance(stop_id, (list, tuple)) else stop_id
+    with _boards_lock:
+        board_key = (resrobot.transport.base_url, key)
+        if board_key not in _boards:
+            _boards[board_key] = LiveBoard(resrobot, key)
+            while len(_boards) > MAX_BOARDS:
+                _boards.popitem(last=False)
+        _boards.move_to_end(board_key)
+        return _boards[board_key]
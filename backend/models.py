@@ -0,0 +1,278 @@
+"""
+Compact, immutable records for the ResRobot data used by the app.
+
+Responses are turned into these records once, at the client boundary, and
+every layer in `backend/` passes them around instead of raw API dicts.
+DataFrames are only built at the edge, right before something is shown.
+
+All records are frozen dataclasses with `__slots__`, which keeps them small
+and their attribute access fast when a long session holds many trips.
+"""
+
+from dataclasses import dataclass, replace
+
+
+def as_list(value) -> list:
+    """ResRobot returns a single object instead of a list of one; undo that."""
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _float(value) -> float:
+    return float(value) if value is not None else 0.0
+
+
+@dataclass(frozen=True, slots=True)
+class StopLocation:
+    ext_id: str
+    name: str
+    lat: float
+    lon: float
+    products: int = 0
+    dist: int | None = None
+
+    @classmethod
+    def from_api(cls, data: dict) -> "StopLocation":
+        return cls(
+            ext_id=str(data.get("extId", "Unknown")),
+            name=data.get("name", ""),
+            lat=_float(data.get("lat")),
+            lon=_float(data.get("lon")),
+            products=int(data.get("products", 0)),
+            dist=data.get("dist"),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class PassedStop:
+    name: str
+    ext_id: str
+    lat: float
+    lon: float
+    arr_time: str | None = None
+    arr_date: str | None = None
+    dep_time: str | None = None
+    dep_date: str | None = None
+    route_idx: int | None = None
+
+    @property
+    def time(self) -> str | None:
+        return self.arr_time or self.dep_time
+
+    @property
+    def date(self) -> str | None:
+        return self.arr_date or self.dep_date
+
+    @classmethod
+    def from_api(cls, data: dict) -> "PassedStop":
+        return cls(
+            name=data.get("name", "Unknown"),
+            ext_id=str(data.get("extId", "")),
+            lat=_float(data.get("lat")),
+            lon=_float(data.get("lon")),
+            arr_time=data.get("arrTime"),
+            arr_date=data.get("arrDate"),
+            dep_time=data.get("depTime"),
+            dep_date=data.get("depDate"),
+            route_idx=data.get("routeIdx"),
+        )
+
+    @classmethod
+    def from_leg_end(cls, data: dict, arriving: bool) -> "PassedStop":
+        """Leg Origin/Destination objects carry a plain date and time."""
+        times = {
+            "arr_time" if arriving else "dep_time": data.get("time"),
+            "arr_date" if arriving else "dep_date": data.get("date"),
+        }
+        return cls(
+            name=data.get("name", "Unknown"),
+            ext_id=str(data.get("extId", "")),
+            lat=_float(data.get("lat")),
+            lon=_float(data.get("lon")),
+            route_idx=data.get("routeIdx"),
+            **times,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class Leg:
+    name: str
+    type: str
+    direction: str | None
+    origin: PassedStop
+    destination: PassedStop
+    stops: tuple[PassedStop, ...]
+    journey_ref: str | None = None
+
+    @classmethod
+    def from_api(cls, data: dict) -> "Leg":
+        return cls(
+            name=data.get("name", "Okänd linje"),
+            type=data.get("type", ""),
+            direction=data.get("direction"),
+            origin=PassedStop.from_leg_end(data.get("Origin", {}), arriving=False),
+            destination=PassedStop.from_leg_end(
+                data.get("Destination", {}), arriving=True
+            ),
+            stops=tuple(
+                PassedStop.from_api(stop)
+                for stop in as_list(data.get("Stops", {}).get("Stop"))
+            ),
+            journey_ref=data.get("JourneyDetailRef", {}).get("ref"),
+        )
+
+    def with_journey_stops(self, journey_stops: tuple[PassedStop, ...]) -> "Leg":
+        """
+        Returns a copy of the leg holding the part of its journey's full stop
+        list that lies between the leg's origin and destination.
+        """
+        first, last = self.origin.route_idx, self.destination.route_idx
+        if first is not None and last is not None:
+            stops = tuple(
+                stop
+                for stop in journey_stops
+                if stop.route_idx is not None and first <= stop.route_idx <= last
+            )
+            return replace(self, stops=stops)
+
+        ids = [stop.ext_id for stop in journey_stops]
+        if self.origin.ext_id in ids and self.destination.ext_id in ids:
+            start = ids.index(self.origin.ext_id)
+            end = ids.index(self.destination.ext_id, start) + 1
+            return replace(self, stops=tuple(journey_stops[start:end]))
+        return self
+
+
+@dataclass(frozen=True, slots=True)
+class Trip:
+    legs: tuple[Leg, ...]
+    ctx_recon: str | None = None
+
+    @property
+    def origin(self) -> PassedStop | None:
+        return self.legs[0].origin if self.legs else None
+
+    @property
+    def destination(self) -> PassedStop | None:
+        return self.legs[-1].destination if self.legs else None
+
+    @property
+    def signature(self) -> tuple:
+        """
+        Identifies the trip by its legs: line, boarding stop and time, and
+        alighting stop. Overlapping searches return the same trip with
+        different contexts, so this is what duplicates are detected by.
+        """
+        return tuple(
+            (
+                leg.name,
+                leg.origin.ext_id,
+                leg.origin.date,
+                leg.origin.time,
+                leg.destination.ext_id,
+            )
+            for leg in self.legs
+        )
+
+    @classmethod
+    def from_api(cls, data: dict) -> "Trip":
+        return cls(
+            legs=tuple(
+                Leg.from_api(leg) for leg in as_list(data.get("LegList", {}).get("Leg"))
+            ),
+            ctx_recon=data.get("ctxRecon"),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class Departure:
+    line: str
+    direction: str
+    time: str | None
+    date: str | None
+    rt_time: str | None = None
+    rt_date: str | None = None
+    stop_ext_id: str | None = None
+    stop_name: str | None = None
+    operator: str | None = None
+    journey_ref: str | None = None
+    cancelled: bool = False
+
+    @classmethod
+    def from_api(cls, data: dict) -> "Departure":
+        product = data.get("ProductAtStop", {})
+        return cls(
+            line=product.get("name", "Okänd linje"),
+            direction=data.get("direction", "Okänd destination"),
+            time=data.get("time"),
+            date=data.get("date"),
+            rt_time=data.get("rtTime"),
+            rt_date=data.get("rtDate"),
+            stop_ext_id=data.get("stopExtId"),
+            stop_name=data.get("stop"),
+            operator=product.get("operator"),
+            journey_ref=data.get("JourneyDetailRef", {}).get("ref"),
+            cancelled=bool(data.get("cancelled", False)),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class Arrival:
+    line: str
+    origin: str
+    time: str | None
+    date: str | None
+    rt_time: str | None = None
+    rt_date: str | None = None
+    stop_ext_id: str | None = None
+    stop_name: str | None = None
+    operator: str | None = None
+    journey_ref: str | None = None
+    cancelled: bool = False
+
+    @classmethod
+    def from_api(cls, data: dict) -> "Arrival":
+        product = data.get("ProductAtStop", {})
+        return cls(
+            line=product.get("name", "Okänd linje"),
+            origin=data.get("origin", "Okänd avgångsplats"),
+            time=data.get("time"),
+            date=data.get("date"),
+            rt_time=data.get("rtTime"),
+            rt_date=data.get("rtDate"),
+            stop_ext_id=data.get("stopExtId"),
+            stop_name=data.get("stop"),
+            operator=product.get("operator"),
+            journey_ref=data.get("JourneyDetailRef", {}).get("ref"),
+            cancelled=bool(data.get("cancelled", False)),
+        )
+
+
+def parse_stop_locations(data: dict | None) -> list[StopLocation]:
+    """StopLocations of a location.name or location.nearbystops response."""
+    if not data:
+        return []
+    return [
+        StopLocation.from_api(entry["StopLocation"])
+        for entry in as_list(data.get("stopLocationOrCoordLocation"))
+        if "StopLocation" in entry
+    ]
+
+
+def parse_trips(data: dict | None) -> list[Trip]:
+    return [Trip.from_api(trip) for trip in as_list((data or {}).get("Trip"))]
+
+
+def parse_journey_stops(data: dict | None) -> tuple[PassedStop, ...]:
+    """The full stop list of a journeyDetail response."""
+    stops = as_list((data or {}).get("Stops", {}).get("Stop"))
+    return tuple(PassedStop.from_api(stop) for stop in stops)
+
+
+def parse_departures(data: dict | None) -> list[Departure]:
+    return [Departure.from_api(dep) for dep in as_list((data or {}).get("Departure"))]
+
+
+def parse_arrivals(data: dict | None) -> list[Arrival]:
+    return [Arrival.from_api(arr) for arr in as_list((data or {}).get("Arrival"))]
@@ -0,0 +1,44 @@
+"""
+Builders for ResRobot query parameters, shared by `ResRobot` and
+`AsyncResRobot` so both clients send identical requests (and therefore hit
+the same cache and single-flight keys).
+"""
+
+
+def trip_params(
+    origin_id, destination_id, passlist=True, date=None, time=None, context=None
+) -> dict:
+    params = {"originId": origin_id, "destId": destination_id}
+    if passlist:
+        params.update({"passlist": "true", "showPassingPoints": "true"})
+    else:
+        params["passlist"] = "false"
+    if date:
+        params["date"] = date
+    if time:
+        params["time"] = time
+    if context:
+        params["context"] = context
+    return params
+
+
+def board_params(
+    location_id, date=None, time=None, duration=None, max_journeys=None, products=None
+) -> dict:
+    """
+    Parameters of a departure or arrival board. Without `date` and `time`
+    the board starts now; without `duration` it spans the API's default 60
+    minutes, and `products` is a bitmask of the transport modes to include.
+    """
+    params = {"id": location_id}
+    if date:
+        params["date"] = date
+    if time:
+        params["time"] = time
+    if duration is not None:
+        params["duration"] = duration
+    if max_journeys is not None:
+        params["maxJourneys"] = max_journeys
+    if products is not None:
+        params["products"] = products
+    return params
@@ -0,0 +1,220 @@
+import asyncio
+import atexit
+import json
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from utils.constants import QUOTA_PATH
+
+# Request priorities, lower value is more important.
+INTERACTIVE = 0  # trip searches and departure boards a user is waiting for
+NORMAL = 1  # stop lookups such as the search typeahead
+BACKGROUND = 2  # prefetching and ResRobotDay history pulls
+
+ENDPOINT_PRIORITY = {
+    "trip": INTERACTIVE,
+    "journeyDetail": INTERACTIVE,
+    "departureBoard": INTERACTIVE,
+    "arrivalBoard": INTERACTIVE,
+    "location.name": NORMAL,
+    "location.nearbystops": NORMAL,
+}
+
+# Share of the per-minute bucket kept free for more important requests.
+# Background calls only get a token while half of the bucket is left.
+RESERVES = {INTERACTIVE: 0.0, NORMAL: 0.2, BACKGROUND: 0.5}
+
+# Share of the monthly quota after which a priority is shed.
+MONTHLY_CUTOFFS = {INTERACTIVE: 1.0, NORMAL: 0.97, BACKGROUND: 0.9}
+
+# Longest time in seconds a priority queues for a token before it is shed.
+MAX_WAIT = {INTERACTIVE: 10.0, NORMAL: 3.0, BACKGROUND: 1.0}
+
+# Seconds between writes of the monthly counter to the state file.
+SAVE_INTERVAL = 10.0
+
+
+class QuotaExceeded(Exception):
+    """Raised when a request is shed to protect the access key's quota."""
+
+
+class RateLimiter:
+    """
+    Quota-aware token-bucket rate limiter for the ResRobot access key.
+
+    The per-minute quota is a token bucket that refills continuously. Each
+    priority keeps a reserve of tokens free for more important requests, so
+    a burst of typeahead searches or background pulls cannot starve trip
+    searches and departure boards. The monthly quota is a counter; once
+    usage nears it, background and then normal requests are shed.
+
+    Features:
+    - Blocking `acquire` for threads and `acquire_async` for asyncio.
+    - Queueing with a per-priority maximum wait before shedding.
+    - Optional persistence of the monthly counter to a JSON file, written
+      at most every `SAVE_INTERVAL` seconds and added to what other
+      processes stored, so the collector and the dashboard share the count.
+    - `usage()` for monitoring current budget usage, and `available()` for
+      callers sizing a batch to what a priority may spend now.
+    """
+
+    def __init__(self, per_minute=45, monthly=30000, state_path=None):
+        self.per_minute = per_minute
+        self.monthly = monthly
+        self.state_path = Path(state_path) if state_path else None
+
+        self._rate = per_minute / 60.0
+        self._tokens = float(per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+        self._month = datetime.now().strftime("%Y-%m")
+        # Requests counted since the state file was last written.
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+        self._shed = {INTERACTIVE: 0, NORMAL: 0, BACKGROUND: 0}
+        self._month_used = self._stored_usage()
+        if self.state_path is not None:
+            atexit.register(self.flush)
+
+    def _stored_usage(self) -> int:
+        """This month's count in the state file, 0 if there is none."""
+        if self.state_path is None or not self.state_path.exists():
+            return 0
+        try:
+            state = json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return 0
+        if state.get("month") != self._month:
+            return 0
+        return int(state.get("used", 0))
+
+    def _save_state(self, force=False):
+        """
+        Adds the requests counted since the last write to the count in the
+        state file. Called with the lock held; only writes every
+        `SAVE_INTERVAL` seconds unless `force` is set.
+        """
+        if self.state_path is None or not self._unsaved:
+            return
+        now = time.monotonic()
+        if not force and now - self._saved_at < SAVE_INTERVAL:
+            return
+        used = self._stored_usage() + self._unsaved
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        state = {"month": self._month, "used": used}
+        self.state_path.write_text(json.dumps(state), encoding="utf-8")
+        self._month_used = max(self._month_used, used)
+        self._unsaved = 0
+        self._saved_at = now
+
+    def flush(self):
+        """Writes the requests not yet counted in the state file."""
+        with self._lock:
+            self._save_state(force=True)
+
+    def _refill(self, now):
+        self._tokens = min(
+            self.per_minute, self._tokens + (now - self._updated) * self._rate
+        )
+        self._updated = now
+
+    def _try_take(self, priority) -> float:
+        """
+        Takes a token if the priority may have one and returns 0, otherwise
+        returns the number of seconds until it could. Raises `QuotaExceeded`
+        when the monthly cutoff for the priority is reached.
+        """
+        with self._lock:
+            month = datetime.now().strftime("%Y-%m")
+            if month != self._month:
+                self._save_state(force=True)
+                self._month, self._month_used, self._unsaved = month, 0, 0
+
+            if self._month_used >= self.monthly * MONTHLY_CUTOFFS[priority]:
+                self._shed[priority] += 1
+                raise QuotaExceeded(
+                    f"Monthly quota nearly used ({self._month_used}/{self.monthly})"
+                )
+
+            self._refill(time.monotonic())
+            floor = self.per_minute * RESERVES[priority]
+            if self._tokens - 1 < floor:
+                return (floor + 1 - self._tokens) / self._rate
+
+            self._tokens -= 1
+            self._month_used += 1
+            self._unsaved += 1
+            self._save_state()
+            return 0.0
+
+    def _shed_after_wait(self, priority):
+        with self._lock:
+            self._shed[priority] += 1
+        raise QuotaExceeded("Per-minute quota in use by higher priority requests")
+
+    def acquire(self, priority=INTERACTIVE):
+        """Blocks until a token is available or raises `QuotaExceeded`."""
+        deadline = time.monotonic() + MAX_WAIT[priority]
+        while True:
+            wait = self._try_take(priority)
+            if wait == 0:
+                return
+            if time.monotonic() + wait > deadline:
+                self._shed_after_wait(priority)
+            time.sleep(wait)
+
+    async def acquire_async(self, priority=INTERACTIVE):
+        """The asyncio version of `acquire`, which never blocks the loop."""
+        deadline = time.monotonic() + MAX_WAIT[priority]
+        while True:
+            wait = self._try_take(priority)
+            if wait == 0:
+                return
+            if time.monotonic() + wait > deadline:
+                self._shed_after_wait(priority)
+            await asyncio.sleep(wait)
+
+    def available(self, priority=INTERACTIVE) -> int:
+        """Tokens a priority could take right now without waiting."""
+        with self._lock:
+            self._refill(time.monotonic())
+            floor = self.per_minute * RESERVES[priority]
+            return max(0, int(self._tokens - floor))
+
+    def usage(self) -> dict:
+        """Returns the current budget usage for monitoring."""
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                "per_minute": self.per_minute,
+                "tokens_left": round(self._tokens, 2),
+                "month": self._month,
+                "month_used": self._month_used,
+                "monthly": self.monthly,
+                "month_fraction": self._month_used / self.monthly,
+                "shed": {
+                    "interactive": self._shed[INTERACTIVE],
+                    "normal": self._shed[NORMAL],
+                    "background": self._shed[BACKGROUND],
+                },
+            }
+
+
+_default_limiter = None
+_default_lock = threading.Lock()
+
+
+def get_default_limiter() -> RateLimiter:
+    """
+    Returns the process-wide limiter used when none is given, with the
+    monthly count kept in `QUOTA_PATH`. Every client of a process, the
+    dashboard's included, draws from its one per-minute bucket.
+    """
+    global _default_limiter
+    with _default_lock:
+        if _default_limiter is None:
+            _default_limiter = RateLimiter(state_path=QUOTA_PATH)
+        return _default_limiter
@@ -1,9 +1,109 @@
+"""
+Today's departure and arrival boards of a station, from midnight until now.
+
+The range is split into fixed windows of `WINDOW_MINUTES` minutes starting at
+midnight, which are fetched concurrently instead of as one request spanning
+the whole day. A window that has fully passed is kept and never fetched
+again, so later calls only request the windows after it, and a departure
+returned by two neighbouring windows is kept once, by its journey.
+
+The API only returns roughly the last `RETENTION_MINUTES`, so older windows
+are not requested, and one call only requests as many windows as background
+requests may spend right now, newest first. The rest are left for later
+calls. Every hour of the day so far that a frame lacks, whether it is still
+to be fetched or no longer retained, is listed in
+`frame.attrs["missing_hours"]`, and those still to be fetched in
+`frame.attrs["pending_hours"]`.
+
+When the collector (`utils/collector.py`) has recorded the station, each
+hour its polls covered is read from its event store instead, which also
+covers the hours the API no longer returns. Windows are only requested for
+the other hours, and an hour neither source covers is missing.
+"""
+
+import threading
 from datetime import datetime
 
 import pandas as pd
-import requests
 
 from backend.connect_to_api import ResRobot
+from backend.event_store import EventStore, get_default_event_store
+from backend.frames import normalize_board, records_frame
+from backend.models import parse_arrivals, parse_departures
+from backend.queries import board_params
+from backend.rate_limit import BACKGROUND
+from backend.singleflight import flights
+
+WINDOW_MINUTES = 60
+
+# How far back the API still returns boards; older windows come back empty.
+RETENTION_MINUTES = 6 * 60
+
+BOARDS = {
+    "departure": ("departureBoard", parse_departures),
+    "arrival": ("arrivalBoard", parse_arrivals),
+}
+
+
+def _clock(minute: int) -> str:
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def _row_key(row):
+    return row.journey_ref or row
+
+
+def _hours(frame: pd.DataFrame) -> pd.Series:
+    """The planned hour of each row of an untyped board frame."""
+    if "time" not in frame:
+        return pd.Series(index=frame.index, dtype=float)
+    return pd.to_numeric(frame["time"].str[:2], errors="coerce")
+
+
+def _covered_hours(intervals, minute: int) -> set[int]:
+    """Hours until `minute` lying wholly inside one of the merged intervals."""
+    return {
+        hour
+        for hour in range(-(-minute // 60))
+        if any(
+            start <= hour * 60 and min(hour * 60 + 60, minute) <= end
+            for start, end in intervals
+        )
+    }
+
+
+class _History:
+    """The rows of one board of one station for one day."""
+
+    def __init__(self, board: str, date: str):
+        self.board = board
+        self.date = date
+        self.rows = {}
+        # Window start -> minute after midnight it has been fetched up to.
+        self.covered = {}
+        # Bumped whenever a fetched row is new or changed; `frame` is the last
+        # typed frame built and the version, minute and coverage it shows.
+        self.version = 0
+        self.frame = None
+
+    # Windows are whole hours, so `start // 60` is the hour of a window.
+
+    def windows(self, minute: int, stored=()) -> list[tuple[int, int]]:
+        """
+        `(start, duration)` of the windows still to fetch up to `minute`,
+        leaving out those older than the API retains and the `stored` hours.
+        """
+        first = max(0, minute - RETENTION_MINUTES)
+        first -= first % WINDOW_MINUTES
+        return [
+            (start, min(WINDOW_MINUTES, minute - start))
+            for start in range(first, minute, WINDOW_MINUTES)
+            if self.covered.get(start, start) < start + WINDOW_MINUTES
+            and start // 60 not in stored
+        ]
+
+    def fetched_hours(self) -> set[int]:
+        return {start // 60 for start in self.covered}
 
 
 class ResRobotDay:
@@ -13,64 +113,212 @@ class ResRobotDay:
     midnight to the current moment. However, the API only
     retains data for a few hours, meaning it does not provide
     historical data beyond 5-6 hours.
+
+    Features:
+    - Fetches the day in windows of `WINDOW_MINUTES`, all concurrently and
+      at background priority, within the API's retention and the current
+      background budget.
+    - Keeps the windows that have passed, so a later call only fetches the
+      minutes since the last one (and the window still in progress).
+    - Drops the duplicates of a journey returned by two windows.
+    - Fetches departures and arrivals, or the boards of many stations,
+      together in one batch.
+    - Reads stations recorded by the collector from the `EventStore`
+      without calling the API.
+    - Returns typed frames (see `backend.frames`) with `scheduled` and
+      `realtime` timestamps instead of time strings.
     """
 
-    def __init__(self):
+    def __init__(self, res: ResRobot | None = None, store: EventStore | None = None):
         """
         Initializes ResRobotDay with an instance of ResRobot
-        and retrieves the API key.
+        and retrieves the API key. Requests go through the
+        client's rate limiter, cache and shared transport.
         """
-        self.res = ResRobot()
+        self.res = res or ResRobot()
         self.API_KEY = self.res.api_key
+        self.store = store
+        self._histories = {}
+        self._lock = threading.Lock()
 
-    def departures_until_now(self, station_id: int) -> pd.DataFrame:
+    def _history(self, board, date) -> _History:
+        history = self._histories.get(board)
+        if history is None or history.date != date:
+            history = self._histories[board] = _History(board[0], date)
+        return history
+
+    def _update(self, boards, now, stored):
+        """
+        Fetches the missing windows of every `(board_type, station_id)` in
+        `boards` in one batch, except those of its `stored` hours. Sessions
+        asking for the same boards in the same minute share one call.
+        """
+        key = ("resrobot_day", id(self), tuple(boards), now.strftime("%Y-%m-%d %H:%M"))
+        flights.do(key, lambda: self._fetch_windows(boards, now, stored))
+
+    def _fetch_windows(self, boards, now, stored):
+        date = now.strftime("%Y-%m-%d")
+        minute = now.hour * 60 + now.minute
+
+        with self._lock:
+            planned = []
+            for board_type, station_id in boards:
+                history = self._history((board_type, station_id), date)
+                planned.extend(
+                    (board_type, station_id, history, start, duration)
+                    for start, duration in history.windows(
+                        minute, stored[board_type, station_id]
+                    )
+                )
+        # Windows never fetched before those only refreshed, each newest
+        # first, as many as the background budget allows now; the others are
+        # requested by later calls while they are still retained. Otherwise
+        # the in-progress windows of many stations could take the whole
+        # budget on every call.
+        planned.sort(key=lambda window: (window[3] in window[2].covered, -window[3]))
+        planned = planned[: self.res.limiter.available(BACKGROUND)]
+        if not planned:
+            return
+
+        aio = self.res.aio
+        responses = self.res.gather(
+            *(
+                aio.fetch(
+                    BOARDS[board_type][0],
+                    board_params(
+                        station_id, date=date, time=_clock(start), duration=duration
+                    ),
+                    priority=BACKGROUND,
+                )
+                for board_type, station_id, _, start, duration in planned
+            )
+        )
+
+        with self._lock:
+            for (board_type, _, history, start, duration), data in zip(
+                planned, responses
+            ):
+                if data is None or history.date != date:
+                    continue
+                for row in BOARDS[board_type][1](data):
+                    key = _row_key(row)
+                    if history.rows.get(key) != row:
+                        history.rows[key] = row
+                        history.version += 1
+                history.covered[start] = max(
+                    history.covered.get(start, start), start + duration
+                )
+
+    def _coverage(self, board, date) -> list:
+        """The merged minute intervals the collector polled a board today."""
+        if self.store is None:
+            return []
+        return self.store.coverage(*board, date)
+
+    def _boards(self, boards) -> list[pd.DataFrame]:
+        """
+        Today's frames of every `(board_type, station_id)` in `boards`. Each
+        hour comes from the event store where the collector covered it, and
+        from the API otherwise; `attrs["missing_hours"]` lists the hours
+        neither covered, and `attrs["pending_hours"]` those of them the API
+        still retains, which later calls fetch.
+
+        A board's frame is only built again when new rows were fetched, the
+        collector polled again or the minute changed; `attrs["version"]`
+        identifies what it shows. The frames are shared, not copied.
+        """
         now = datetime.now()
-        date_str = now.strftime("%Y-%m-%d")
-
-        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        minutes_since_midnight = int((now - midnight).total_seconds() / 60)
-
-        url = "https://api.resrobot.se/v2.1/departureBoard"
-        params = {
-            "id": station_id,
-            "format": "json",
-            "accessId": self.API_KEY,
-            "date": date_str,
-            "time": "00:00",
-            "duration": minutes_since_midnight,
+        date, minute = now.strftime("%Y-%m-%d"), now.hour * 60 + now.minute
+        coverage = {board: self._coverage(board, date) for board in boards}
+        stored = {
+            board: _covered_hours(intervals, minute)
+            for board, intervals in coverage.items()
         }
-        try:
-            resp = requests.get(url, params=params)
-            resp.raise_for_status()
-            data = resp.json()
-            departures = data.get("Departure", [])
-            return pd.DataFrame(departures)
-        except requests.exceptions.RequestException as err:
-            print(f"HTTP-fel vid hämtning av avgångar: {err}")
-            return pd.DataFrame()
+        self._update(boards, now, stored)
+
+        frames = []
+        for board in boards:
+            with self._lock:
+                history = self._history(board, date)
+                version = (
+                    history.version,
+                    minute,
+                    tuple(map(tuple, coverage[board])),
+                )
+                if (
+                    history.frame is not None
+                    and history.frame.attrs["version"] == version
+                ):
+                    frames.append(history.frame)
+                    continue
+                fetched = records_frame(list(history.rows.values()))
+                fetched_hours = history.fetched_hours() - stored[board]
+            frame = pd.DataFrame()
+            if self.store is not None:
+                frame = self.store.read(*board, date, until=now.strftime("%H:%M:%S"))
+            # The store's rows of hours the API did not cover are kept too:
+            # a partly polled hour is still better than none.
+            fetched = fetched[_hours(fetched).isin(fetched_hours)]
+            frame = frame[~_hours(frame).isin(fetched_hours)]
+            frame = normalize_board(
+                pd.concat([frame, fetched], ignore_index=True), board[0]
+            )
+            frame.attrs["missing_hours"] = sorted(
+                set(range(-(-minute // 60))) - stored[board] - fetched_hours
+            )
+            retained = max(0, minute - RETENTION_MINUTES) // 60
+            frame.attrs["pending_hours"] = [
+                hour for hour in frame.attrs["missing_hours"] if hour >= retained
+            ]
+            frame.attrs["version"] = version
+            with self._lock:
+                history.frame = frame
+            frames.append(frame)
+        return frames
+
+    def board_until_now(self, station_id: int, board_type="departure") -> pd.DataFrame:
+        """Today's departures or arrivals of a station until now, typed."""
+        (frame,) = self._boards([(board_type, station_id)])
+        return frame
+
+    def boards_until_now(self, station_ids, board_type="departure") -> list:
+        """
+        Today's typed departures or arrivals of many stations, in input
+        order, with the windows of all of them fetched in one batch.
+        """
+        return self._boards([(board_type, station_id) for station_id in station_ids])
+
+    def departures_until_now(self, station_id: int) -> pd.DataFrame:
+        return self.board_until_now(station_id, "departure")
 
     def arrivals_until_now(self, station_id: int) -> pd.DataFrame:
-        now = datetime.now()
-        date_str = now.strftime("%Y-%m-%d")
-
-        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        minutes_since_midnight = int((now - midnight).total_seconds() / 60)
-
-        url = "https://api.resrobot.se/v2.1/arrivalBoard"
-        params = {
-            "id": station_id,
-            "format": "json",
-            "accessId": self.API_KEY,
-            "date": date_str,
-            "time": "00:00",
-            "duration": minutes_since_midnight,
-        }
-        try:
-            resp = requests.get(url, params=params)
-            resp.raise_for_status()
-            data = resp.json()
-            arrivals = data.get("Arrival", [])
-            return pd.DataFrame(arrivals)
-        except requests.exceptions.RequestException as err:
-            print(f"HTTP-fel vid hämtning av ankomster: {err}")
-            return pd.DataFrame()
+        return self.board_until_now(station_id, "arrival")
+
+    def departures_and_arrivals_until_now(
+        self, station_id: int
+    ) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Fetches today's departures and arrivals concurrently, so both
+        boards cost the latency of a single request.
+        """
+        departures, arrivals = self._boards(
+            [("departure", station_id), ("arrival", station_id)]
+        )
+        return departures, arrivals
+
+
+_default_day = None
+_default_lock = threading.Lock()
+
+
+def get_default_resrobot_day(resrobot: ResRobot | None = None) -> ResRobotDay:
+    """
+    Returns the process-wide `ResRobotDay`, whose history every session
+    shares. It is created with the client of the first caller, so pages
+    pass the dashboard's client and its cache and rate limiter are used.
+    """
+    global _default_day
+    with _default_lock:
+        if _default_day is None:
+            _default_day = ResRobotDay(resrobot, store=get_default_event_store())
+        return _default_day
@@ -0,0 +1,88 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls across threads.
+
+    The first caller for a key (the leader) runs the function; every caller
+    that arrives with the same key while it is still running waits for the
+    leader and receives the same result, or the same exception. Once the call
+    finishes, the key is released and the next caller starts a fresh call.
+
+    With Streamlit every browser session runs in its own thread, so a popular
+    station on screen in many sessions costs one upstream request instead of
+    one per session, and an expiring cache entry does not cause a stampede.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as err:
+            future.set_exception(err)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """
+    The asyncio counterpart of `SingleFlight`: concurrent awaits of the same
+    key share one task. All callers must use the same event loop, which holds
+    for the shared loop in `backend.async_client`.
+
+    Cancelling one caller leaves the shared task running for the others; the
+    task itself is only cancelled once every caller waiting for it is gone,
+    e.g. when a typeahead lookup is superseded by the next keystroke.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+
+    async def do(self, key, coro_fn):
+        call = self._tasks.get(key)
+        if call is None:
+            call = {"task": asyncio.ensure_future(coro_fn()), "waiters": 0}
+            self._tasks[key] = call
+            call["task"].add_done_callback(lambda _: self._tasks.pop(key, None))
+
+        call["waiters"] += 1
+        try:
+            return await asyncio.shield(call["task"])
+        except asyncio.CancelledError:
+            if call["waiters"] == 1:
+                call["task"].cancel()
+            raise
+        finally:
+            call["waiters"] -= 1
+
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+
+# Process-wide instances shared by every client.
+flights = SingleFlight()
+async_flights = AsyncSingleFlight()
@@ -0,0 +1,162 @@
+"""
+A local spatial index over stop coordinates, answering the radius queries of
+`location.nearbystops` without a request.
+
+Stops are bucketed into a grid of square cells (`cell_m` metres along a
+meridian). A query only looks at the cells overlapping its bounding box and
+filters their stops with a vectorized haversine distance. `query_many`
+answers thousands of points in one call by grouping them per cell, so each
+group is one distance matrix instead of one query per point.
+"""
+
+import threading
+from dataclasses import replace
+
+import numpy as np
+
+from backend.models import StopLocation
+from backend.stop_index import get_default_stop_index
+
+EARTH_RADIUS_M = 6_371_000.0
+METRES_PER_DEGREE = np.pi * EARTH_RADIUS_M / 180.0
+
+
+def haversine(lat, lon, lats, lons) -> np.ndarray:
+    """Great-circle distances in metres, broadcast over NumPy arrays."""
+    lat, lon, lats, lons = map(np.radians, (lat, lon, lats, lons))
+    a = (
+        np.sin((lats - lat) / 2) ** 2
+        + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class SpatialIndex:
+    """
+    Grid index for nearby-stop queries.
+
+    Features:
+    - `nearby` returns `StopLocation` records with `dist` in metres, nearest
+      first, like `ResRobot.nearby_stops`. The product masks are those of
+      the stop list, 0 for GTFS; `Stops.find_nearby_stops` fills them in.
+    - `query_many` answers radius queries for many points at once.
+    - `coverage` counts the stops within reach of each point.
+    """
+
+    def __init__(self, stops: list[StopLocation], cell_m=500):
+        self.stops = stops
+        self.cell_deg = cell_m / METRES_PER_DEGREE
+        self.lats = np.array([stop.lat for stop in stops], dtype=float)
+        self.lons = np.array([stop.lon for stop in stops], dtype=float)
+
+        # Stops are sorted by cell, row by row, so the cells of one row that
+        # overlap a query are one contiguous slice of the arrays.
+        rows, cols = self._cells(self.lats, self.lons)
+        self._keys = self._cell_keys(rows, cols)
+        self._order = np.argsort(self._keys, kind="stable")
+        self._keys = self._keys[self._order]
+        self._lats, self._lons = self.lats[self._order], self.lons[self._order]
+
+    def _cells(self, lats, lons):
+        return (
+            np.floor(np.asarray(lats) / self.cell_deg).astype(np.int64),
+            np.floor(np.asarray(lons) / self.cell_deg).astype(np.int64),
+        )
+
+    @staticmethod
+    def _cell_keys(rows, cols):
+        return rows * (1 << 32) + cols
+
+    def _candidates(self, lat, lon, radius) -> np.ndarray:
+        """Sorted-array positions of the stops in the cells around a point."""
+        dlat = radius / METRES_PER_DEGREE
+        dlon = dlat / max(np.cos(np.radians(lat)), 1e-6)
+        row_lo, col_lo = self._cells(lat - dlat, lon - dlon)
+        row_hi, col_hi = self._cells(lat + dlat, lon + dlon)
+        rows = np.arange(row_lo, row_hi + 1)
+        starts = np.searchsorted(self._keys, self._cell_keys(rows, col_lo), "left")
+        ends = np.searchsorted(self._keys, self._cell_keys(rows, col_hi), "right")
+        lengths = ends - starts
+        # Concatenated aranges of [start, end) for every row.
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return offsets + np.arange(lengths.sum())
+
+    def nearby(self, lat, lon, radius=1000) -> list[StopLocation]:
+        """Stops within `radius` metres of a point, nearest first."""
+        candidates = self._candidates(lat, lon, radius)
+        dist = haversine(lat, lon, self._lats[candidates], self._lons[candidates])
+        within = dist <= radius
+        candidates, dist = candidates[within], dist[within]
+        order = np.argsort(dist, kind="stable")
+        return [
+            replace(self.stops[self._order[position]], dist=int(round(metres)))
+            for position, metres in zip(candidates[order], dist[order])
+        ]
+
+    def query_many(self, lats, lons, radius=1000):
+        """
+        Radius queries for many points. Returns three arrays of equal length,
+        one entry per (point, stop) pair within reach: the point's position
+        in the input, the stop's position in `self.stops` and the distance in
+        metres.
+        """
+        lats, lons = np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)
+        rows, cols = self._cells(lats, lons)
+        groups, inverse, counts = np.unique(
+            np.stack((rows, cols), axis=1),
+            axis=0,
+            return_inverse=True,
+            return_counts=True,
+        )
+        by_group = np.split(
+            np.argsort(inverse.ravel(), kind="stable"), np.cumsum(counts)[:-1]
+        )
+
+        points, stops, dists = [], [], []
+        for (row, col), members in zip(groups, by_group):
+            # One lookup per cell, widened so it covers any point in the cell.
+            candidates = self._candidates(
+                (row + 0.5) * self.cell_deg,
+                (col + 0.5) * self.cell_deg,
+                radius + self.cell_deg * METRES_PER_DEGREE,
+            )
+            if not len(candidates):
+                continue
+            # Rows of the matrix are points, columns candidate stops.
+            dist = haversine(
+                lats[members, None],
+                lons[members, None],
+                self._lats[candidates],
+                self._lons[candidates],
+            )
+            hit_rows, hit_cols = np.nonzero(dist <= radius)
+            points.append(members[hit_rows])
+            stops.append(self._order[candidates[hit_cols]])
+            dists.append(dist[hit_rows, hit_cols])
+
+        if not points:
+            return (np.empty(0, dtype=np.int64),) * 2 + (np.empty(0),)
+        return np.concatenate(points), np.concatenate(stops), np.concatenate(dists)
+
+    def coverage(self, lats, lons, radius=1000) -> np.ndarray:
+        """Number of stops within `radius` metres of each point."""
+        points, _, _ = self.query_many(lats, lons, radius)
+        return np.bincount(points, minlength=len(lats))
+
+
+_default_index = None
+_default_lock = threading.Lock()
+
+
+def get_default_spatial_index() -> SpatialIndex | None:
+    """
+    Returns the process-wide index over the stops of the default
+    `StopIndex`, or None when no stop list is available.
+    """
+    global _default_index
+    with _default_lock:
+        if _default_index is None:
+            stop_index = get_default_stop_index()
+            if stop_index is not None:
+                _default_index = SpatialIndex(stop_index.stops)
+        return _default_index
@@ -0,0 +1,272 @@
+"""
+A local, in-memory index of stop names, built from a GTFS `stops.txt` file
+(e.g. Trafiklab's GTFS Sverige 2). It answers stop searches without calling
+`location.name`, so typing in a search box costs no quota and no round trip.
+
+Names are normalized (lower case, Swedish diacritics folded, punctuation
+dropped) and indexed by trigram and by word prefix. A query collects the
+candidates sharing its trigrams in one `np.bincount` over the posting lists
+and scores them all at once by the share of the query's trigrams found in
+each name; a name containing the query, also in the middle of a word,
+scores 100. Only when no name reaches the threshold that way are the best
+few re-scored with `fuzz.partial_ratio`.
+
+`StopIndex.narrow` answers a query typed one key at a time. It adds only the
+new trigrams' postings to the previous key's counts, and looks for the query
+inside only the names that contained the previous one.
+"""
+
+import csv
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from fuzzywuzzy import fuzz
+
+from backend.models import StopLocation
+from utils.constants import STOP_LIST_PATH
+
+# Å, Ä and Ö are letters of their own in Swedish, but users type "Goteborg"
+# and "Malmo" as often as the real names, so both sides are folded to ASCII.
+_FOLD = str.maketrans({"æ": "ae", "ø": "o", "ß": "ss"})
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+# Best trigram candidates re-scored by `fuzz.partial_ratio` when none of them
+# reaches the threshold on its own.
+RESCORE_LIMIT = 10
+
+
+def normalize(name: str) -> str:
+    """Lower case, diacritics folded, runs of other characters to one space."""
+    folded = unicodedata.normalize("NFKD", name.lower().translate(_FOLD))
+    ascii_name = "".join(char for char in folded if not unicodedata.combining(char))
+    return _NON_WORD.sub(" ", ascii_name).strip()
+
+
+def trigrams(text: str) -> set[str]:
+    """Trigrams of a normalized name, padded at the start of every word."""
+    padded = " " + text
+    return {"".join(gram) for gram in zip(padded, padded[1:], padded[2:])}
+
+
+class StopIndex:
+    """
+    Offline stop search over a GTFS stop list.
+
+    Features:
+    - Diacritic-insensitive matching ("goteborg" finds "Göteborg C").
+    - Trigram index with vectorized candidate scoring.
+    - Word-prefix index for one and two letter queries.
+    - Lookup of a stop by its extId.
+
+    Results are `StopLocation` records, like those of `ResRobot.find_stops`.
+    """
+
+    def __init__(self, stops: list[StopLocation]):
+        self.stops = stops
+        self.names = [normalize(stop.name) for stop in stops]
+        self._names = np.array(self.names, dtype=str)
+        self._lengths = np.array([len(name) for name in self.names], dtype=np.int32)
+        self._by_ext_id = {stop.ext_id: index for index, stop in enumerate(stops)}
+
+        postings = defaultdict(list)
+        prefixes = defaultdict(set)
+        sizes = np.empty(len(stops), dtype=np.int32)
+        for index, name in enumerate(self.names):
+            grams = trigrams(name)
+            sizes[index] = max(len(grams), 1)
+            for gram in grams:
+                postings[gram].append(index)
+            for word in name.split():
+                prefixes[word[:1]].add(index)
+                prefixes[word[:2]].add(index)
+
+        self._sizes = sizes
+        self._postings = {
+            gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()
+        }
+        self._prefixes = {
+            prefix: np.array(sorted(ids), dtype=np.int32)
+            for prefix, ids in prefixes.items()
+        }
+
+    @classmethod
+    def from_gtfs(cls, path) -> "StopIndex":
+        """
+        Builds the index from a GTFS `stops.txt`. Only stations are kept
+        (`location_type` 1, or stops without a parent station in feeds that
+        lack the column); their `stop_id` is the ResRobot extId.
+        """
+        stops = {}
+        with open(path, newline="", encoding="utf-8-sig") as file:
+            for row in csv.DictReader(file):
+                location_type = row.get("location_type", "")
+                if location_type not in ("1", "") or (
+                    location_type == "" and row.get("parent_station")
+                ):
+                    continue
+                stops[row["stop_id"]] = StopLocation(
+                    ext_id=row["stop_id"],
+                    name=row["stop_name"],
+                    lat=float(row["stop_lat"]),
+                    lon=float(row["stop_lon"]),
+                )
+        return cls(list(stops.values()))
+
+    def __len__(self):
+        return len(self.stops)
+
+    def get(self, ext_id) -> StopLocation | None:
+        index = self._by_ext_id.get(str(ext_id))
+        return self.stops[index] if index is not None else None
+
+    def search(self, query: str, threshold=80, limit=20) -> list[StopLocation]:
+        """
+        Stops whose name matches `query`, best first. Scores are on the
+        0-100 scale of `fuzz.partial_ratio`, and `threshold` works the same
+        way as in `Stops.search_stop_by_name`; a query contained anywhere in
+        a name, also in the middle of a word, scores 100.
+        """
+        return self.top(*self.match(query, threshold), limit)
+
+    def narrow(
+        self, query: str, previous=None, threshold=80, limit=20
+    ) -> tuple[list[StopLocation], "Candidates | None"]:
+        """
+        `search` for a query typed one key at a time. `previous` is the
+        `Candidates` returned for the query before; when `query` extends it,
+        the trigram counts are updated with the new trigrams only and the
+        names containing the query are looked for among those that contained
+        the previous one. The results are exactly those of `search`.
+        Returns the results and the `Candidates` to pass with the next key.
+        """
+        positions, rank, candidates = self._match(query, threshold, previous)
+        return self.top(positions, rank, limit), candidates
+
+    def match(self, query: str, threshold=80):
+        """
+        Positions of all stops matching `query` and their ranks, higher is
+        better, both unordered.
+        """
+        positions, rank, _ = self._match(query, threshold)
+        return positions, rank
+
+    def _match(self, query, threshold, previous=None):
+        empty = np.empty(0, dtype=np.int32), np.empty(0), None
+        text = normalize(query)
+        if not text or not self.stops:
+            return empty
+        if len(text) < 3:
+            return (*self._match_prefix(text), None)
+
+        query_grams = trigrams(text)
+        grams = [gram for gram in query_grams if gram in self._postings]
+        if not grams:
+            return empty
+        if previous is not None and text.startswith(previous.text):
+            # A longer query keeps every trigram of the shorter one, and only
+            # a name containing the shorter one can contain it.
+            hits = previous.hits.copy()
+            for gram in query_grams - previous.grams:
+                if gram in self._postings:
+                    hits[self._postings[gram]] += 1
+            contains = previous.contains
+        else:
+            hits = np.bincount(
+                np.concatenate([self._postings[gram] for gram in grams]),
+                minlength=len(self.stops),
+            )
+            # A name containing the query has all its trigrams but the padded
+            # first one (" st" is missing when "stat" is in "centralstation").
+            inner = {"".join(gram) for gram in zip(text, text[1:], text[2:])}
+            if inner <= self._postings.keys():
+                contains = np.flatnonzero(hits >= len(inner))
+            else:
+                contains = np.empty(0, dtype=np.int64)
+        contains = contains[np.char.find(self._names[contains], text) >= 0]
+        candidates = Candidates(text, frozenset(query_grams), hits, contains)
+
+        # Names containing the query score 100, as `fuzz.partial_ratio` would
+        # score them; the others by the share of the query's trigrams found.
+        contained = np.zeros(len(self.stops), dtype=bool)
+        contained[contains] = True
+        matched = contained | (hits > 0) & (
+            100.0 * hits >= threshold * len(query_grams)
+        )
+        positions = np.flatnonzero(matched)
+        if len(positions):
+            shared = hits[positions]
+            scores = np.where(
+                contained[positions], 100.0, 100.0 * shared / len(query_grams)
+            )
+            return (
+                positions,
+                scores + self._dice(positions, shared, query_grams),
+                candidates,
+            )
+
+        # No name shares enough trigrams, e.g. after a typo in a short query.
+        positions = np.flatnonzero(hits)
+        shared = hits[positions]
+        scores = 100.0 * shared / len(query_grams)
+        rank = scores + self._dice(positions, shared, query_grams)
+        best = positions[np.argsort(-rank)[:RESCORE_LIMIT]]
+        rescored = np.array(
+            [fuzz.partial_ratio(text, self.names[index]) for index in best]
+        )
+        matched = rescored >= threshold
+        return best[matched], rescored[matched].astype(float), candidates
+
+    def _dice(self, positions, shared, query_grams):
+        # Among equal scores, names with fewer other trigrams fit better. The
+        # dice coefficient is below 1, less than one step of the scores.
+        return 2.0 * shared / (self._sizes[positions] + len(query_grams) + 1)
+
+    def top(self, positions, rank, limit=20) -> list[StopLocation]:
+        """The `limit` best stops of a `match` result, best first."""
+        if len(positions) > limit:
+            best = np.argpartition(-rank, limit)[:limit]
+            positions, rank = positions[best], rank[best]
+        order = np.argsort(-rank, kind="stable")
+        return [self.stops[index] for index in positions[order]]
+
+    def _match_prefix(self, text):
+        """Names starting with `text` first, shortest first, then other words."""
+        candidates = self._prefixes.get(text, np.empty(0, dtype=np.int32))
+        starts = np.char.startswith(self._names[candidates], text)
+        rank = 100.0 * starts + 1.0 / (1 + self._lengths[candidates])
+        return candidates, rank
+
+
+@dataclass(frozen=True)
+class Candidates:
+    """
+    What `StopIndex.narrow` keeps of one query for the next keystroke: the
+    trigrams of the query, how many of them each stop's name has, and the
+    positions of the names containing the query.
+    """
+
+    text: str
+    grams: frozenset
+    hits: np.ndarray
+    contains: np.ndarray
+
+
+_default_index = None
+_default_lock = threading.Lock()
+
+
+def get_default_stop_index() -> StopIndex | None:
+    """
+    Returns the process-wide index built from `STOP_LIST_PATH`, or None when
+    no stop list has been downloaded there.
+    """
+    global _default_index
+    with _default_lock:
+        if _default_index is None and Path(STOP_LIST_PATH).exists():
+            _default_index = StopIndex.from_gtfs(STOP_LIST_PATH)
+        return _default_index
@@ -0,0 +1,181 @@
+"""
+Persistent extId -> stop metadata table, and the bulk resolver built on it.
+
+Stop names, coordinates and product masks hardly ever change, yet the app
+used to look a stop up by sending its extId as free text to `location.name`
+every time it needed one. The store keeps every stop the app has seen (from
+searches, nearby results, trip pass lists and journey details), so a known
+stop resolves without a request.
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from backend.models import StopLocation, parse_stop_locations
+from utils.constants import STOP_STORE_PATH
+
+# SQLite limits the number of parameters of one statement.
+_CHUNK = 500
+
+
+class StopStore:
+    """
+    SQLite table of stop metadata keyed by extId.
+
+    Features:
+    - Bulk `get_many` in one query per 500 ids.
+    - `harvest` upserts `StopLocation` and `PassedStop` records; a known
+      product mask is never overwritten by a record without one.
+    - Remembers the rows it has read or written, so harvesting stops that
+      are already stored, e.g. from a cached response, writes nothing.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # ext_id -> (name, lat, lon, products) as stored.
+        self._known = {}
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS stops ("
+            "ext_id TEXT PRIMARY KEY, name TEXT NOT NULL, lat REAL NOT NULL, "
+            "lon REAL NOT NULL, products INTEGER NOT NULL, updated REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get_many(self, ext_ids) -> dict[str, StopLocation]:
+        ids = list(dict.fromkeys(str(ext_id) for ext_id in ext_ids))
+        found = {}
+        with self._lock:
+            for start in range(0, len(ids), _CHUNK):
+                chunk = ids[start:][:_CHUNK]
+                rows = self._conn.execute(
+                    "SELECT ext_id, name, lat, lon, products FROM stops "
+                    f"WHERE ext_id IN ({', '.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for ext_id, name, lat, lon, products in rows:
+                    found[ext_id] = StopLocation(ext_id, name, lat, lon, products)
+                    self._known[ext_id] = (name, lat, lon, products)
+        return found
+
+    def harvest(self, stops):
+        """
+        Stores stops seen in any response. Returns the number of rows
+        written, which is 0 when all of them are stored unchanged.
+        """
+        now = time.time()
+        rows = {
+            stop.ext_id: (
+                stop.ext_id,
+                stop.name,
+                stop.lat,
+                stop.lon,
+                getattr(stop, "products", 0),
+                now,
+            )
+            for stop in stops
+            if stop.ext_id and stop.ext_id != "Unknown" and (stop.lat or stop.lon)
+        }
+        unknown = [ext_id for ext_id in rows if ext_id not in self._known]
+        if unknown:
+            self.get_many(unknown)
+        rows = {
+            ext_id: row
+            for ext_id, row in rows.items()
+            if not self._stored(ext_id, row[1:5])
+        }
+        if not rows:
+            return 0
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO stops VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(ext_id) DO UPDATE SET name = excluded.name, "
+                "lat = excluded.lat, lon = excluded.lon, updated = excluded.updated, "
+                "products = MAX(products, excluded.products)",
+                rows.values(),
+            )
+            self._conn.commit()
+            for ext_id, (_, name, lat, lon, products, _) in rows.items():
+                known = self._known.get(ext_id)
+                products = max(products, known[3]) if known else products
+                self._known[ext_id] = (name, lat, lon, products)
+        return len(rows)
+
+    def _stored(self, ext_id, record) -> bool:
+        """Whether writing `(name, lat, lon, products)` would change nothing."""
+        known = self._known.get(ext_id)
+        if known is None:
+            return False
+        name, lat, lon, products = record
+        return known[:3] == (name, lat, lon) and products <= known[3]
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM stops").fetchone()[0]
+
+
+class StopResolver:
+    """
+    Resolves many extIds to `StopLocation` records at once.
+
+    Known stops come from the `StopStore`, then from the offline `StopIndex`
+    if one is loaded. Only the remaining ids are looked up through
+    `location.name`, all of them concurrently, and the answers are written
+    back to the store.
+    """
+
+    def __init__(self, resrobot, store: StopStore, index=None):
+        self.resrobot = resrobot
+        self.store = store
+        self.index = index
+
+    def resolve(self, ext_ids) -> dict[str, StopLocation]:
+        ids = list(dict.fromkeys(str(ext_id) for ext_id in ext_ids))
+        found = self.store.get_many(ids)
+
+        if self.index is not None:
+            for ext_id in ids:
+                if ext_id not in found:
+                    stop = self.index.get(ext_id)
+                    if stop is not None:
+                        found[ext_id] = stop
+
+        misses = [ext_id for ext_id in ids if ext_id not in found]
+        if misses:
+            aio = self.resrobot.aio
+            responses = self.resrobot.gather(
+                *(aio.get_location_info(ext_id) for ext_id in misses)
+            )
+            fetched = []
+            for ext_id, data in zip(misses, responses):
+                candidates = parse_stop_locations(data)
+                match = next(
+                    (stop for stop in candidates if stop.ext_id == ext_id),
+                    candidates[0] if candidates else None,
+                )
+                if match is not None:
+                    found[ext_id] = match
+                fetched.extend(candidates)
+            self.store.harvest(fetched)
+        return found
+
+    def get(self, ext_id) -> StopLocation | None:
+        return self.resolve([ext_id]).get(str(ext_id))
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_default_stop_store() -> StopStore:
+    """Returns the process-wide store in `STOP_STORE_PATH`."""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = StopStore(STOP_STORE_PATH)
+        return _default_store
@@ -1,6 +1,12 @@
+from dataclasses import replace
+
 from fuzzywuzzy import fuzz
 
 from backend.connect_to_api import ResRobot
+from backend.models import StopLocation
+from backend.spatial_index import SpatialIndex, get_default_spatial_index
+from backend.stop_index import StopIndex, get_default_stop_index
+from backend.stop_store import StopResolver
 
 
 class Stops:
@@ -14,61 +20,85 @@ class Stops:
       Returns the stop's name, latitude, longitude, and available transport products.
     - Finds public transport stops within a given radius (default: 1000 meters) from
       specified coordinates.
+
+    Name searches and stop lookups are answered by a local `StopIndex` when a
+    stop list is available, and fall back to the API only when it has no hit.
+    Nearby searches use the matching `SpatialIndex` in the same way, and
+    stops are looked up by extId through a `StopResolver`.
+
+    All results are `StopLocation` records.
     """
 
-    def __init__(self, resrobot: ResRobot):
+    def __init__(
+        self,
+        resrobot: ResRobot,
+        index: StopIndex | None = None,
+        spatial: SpatialIndex | None = None,
+    ):
         """
-        Initializes Stops with a ResRobot instance.
+        Initializes Stops with a ResRobot instance and optional stop and
+        spatial indexes, by default those built from the stop list in
+        `STOP_LIST_PATH`.
         """
         self.resrobot = resrobot
+        self.index = index if index is not None else get_default_stop_index()
+        self.spatial = spatial if spatial is not None else get_default_spatial_index()
+        self.resolver = StopResolver(resrobot, resrobot.stop_store, self.index)
 
-    def search_stop_by_name(self, location, threshold=80):
-        all_data = self.resrobot.get_location_info(location)
-        stop_locations = all_data.get("stopLocationOrCoordLocation", [])
+    def search_stop_by_name(self, location, threshold=80) -> list[StopLocation]:
+        if self.index is not None:
+            matches = self.index.search(location, threshold)
+            if matches:
+                return matches
 
-        if not stop_locations:
-            return []
+        return self.rank_by_name(
+            location, self.resrobot.find_stops(location), threshold
+        )
 
-        matched_locations = []
+    def rank_by_name(
+        self, location, stops: list[StopLocation], threshold=80
+    ) -> list[StopLocation]:
+        """Orders API search results by fuzzy similarity to the query."""
+        query = location.lower()
+        scored = []
 
-        for stop in stop_locations:
-            stop_data = stop.get("StopLocation", {})
-            stop_name = stop_data.get("name", "")
+        for stop in stops:
+            if stop.name:
+                score = fuzz.partial_ratio(query, stop.name.lower())
+                if score >= threshold:
+                    scored.append((score, stop))
 
-            if stop_name:
-                score = fuzz.partial_ratio(location.lower(), stop_name.lower())
+        scored.sort(key=lambda x: x[0], reverse=True)
+        return [stop for _, stop in scored]
 
-                if score >= threshold:
-                    matched_locations.append(
-                        {
-                            "name": stop_name,
-                            "extId": stop_data.get("extId", "Unknown"),
-                            "score": score,
-                        }
-                    )
+    def get_stop_info(self, ext_id: str) -> StopLocation | None:
+        return self.resolver.get(ext_id)
+
+    def get_stops_info(self, ext_ids) -> dict[str, StopLocation]:
+        """Resolves many extIds at once; see `StopResolver.resolve`."""
+        return self.resolver.resolve(ext_ids)
 
-        matched_locations.sort(key=lambda x: x["score"], reverse=True)
-        return matched_locations
-
-    def get_stop_info(self, ext_id: str):
-        data = self.resrobot.get_location_info(ext_id)
-        stop_data = data["stopLocationOrCoordLocation"][0]["StopLocation"]
-        return {
-            "name": stop_data["name"],
-            "lat": stop_data["lat"],
-            "lon": stop_data["lon"],
-            "products": stop_data["products"],
-        }
-
-    def find_nearby_stops(self, lat: float, lon: float, radius: int = 1000):
-        data = self.resrobot.get_nearby_stops(lat, lon, radius)
-        return [
-            {
-                "name": stop["StopLocation"]["name"],
-                "lat": stop["StopLocation"]["lat"],
-                "lon": stop["StopLocation"]["lon"],
-                "dist": stop["StopLocation"]["dist"],
-                "products": stop["StopLocation"]["products"],
-            }
-            for stop in data.get("stopLocationOrCoordLocation")
-        ]
+    def find_nearby_stops(
+        self, lat: float, lon: float, radius: int = 1000, products=False
+    ) -> list[StopLocation]:
+        """
+        Stops within `radius` metres, nearest first, with `dist` set. Local
+        results take their product masks from the stop store, as the GTFS
+        stop list has none. With `products=True`, the API is asked instead
+        when the store lacks the mask of any of them.
+        """
+        if self.spatial is not None:
+            stops = self.spatial.nearby(lat, lon, radius)
+            if stops:
+                known = self.resrobot.stop_store.get_many(stop.ext_id for stop in stops)
+                stops = [
+                    (
+                        replace(stop, products=known[stop.ext_id].products)
+                        if stop.ext_id in known
+                        else stop
+                    )
+                    for stop in stops
+                ]
+                if not products or all(stop.products for stop in stops):
+                    return stops
+        return self.resrobot.nearby_stops(lat, lon, radius)
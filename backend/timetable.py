@@ -1,99 +1,81 @@
-from datetime import datetime
-
+from backend.cache import TTL_POLICIES
 from backend.connect_to_api import ResRobot
+from backend.departure_board import DepartureBoard, MergedBoard, covers
 
 
 class TimeTable:
     """
     The TimeTable class interacts with the ResRobot API to retrieve departure
-    times from a given stop. This class relies on the ResRobot API for
-    timetable data and uses Python's datetime module to process time calculations.
+    times from a given stop. Each stop's board is fetched once into a
+    `DepartureBoard` snapshot, and every view is a slice of that snapshot.
 
     Features:
     - Fetches all departures from a specific stop using its ID.
     - Calculates the time remaining (in minutes) until each departure from a given
       stop. Only includes upcoming departures and sorts them by soonest departure.
     - Retrieves departures within the next hour from a given stop.
+    - Each view only requests the departures it shows: the next hour, or
+      the next `limit` departures, optionally filtered by product mask.
+    - Switching between views reuses a snapshot whose window covers the
+      new view until it is `max_age` seconds old, the lifetime of a cached
+      departure board.
+    - Given a list of stop ids, every view shows the merged board of the
+      whole station group, with a column naming each departure's stop.
     """
 
-    def __init__(self, resrobot: ResRobot):
+    def __init__(self, resrobot: ResRobot, max_age=TTL_POLICIES["departureBoard"]):
         """
         Initializes TimeTable with a ResRobot instance.
         """
         self.resrobot = resrobot
+        self.max_age = max_age
+        self._boards = {}
 
-    def show_departure_from_stop(self, stop_id: int):
-        data = self.resrobot.get_timetable(location_id=stop_id)
-
-        departures = data.get("Departure", [])
-
-        result = []
-        for departure in departures:
-            line = departure.get("ProductAtStop", {}).get("name", "Okänd linje")
-            direction = departure.get("direction", "Okänd destination")
-            time = departure.get("time", "N/A")
-            result.append({"Linje": line, "Destination": direction, "Avgångstid": time})
-
-        return result
-
-    def show_time_to_departure(self, stop_id: int, limit: int = 20):
-        data = self.resrobot.get_timetable(location_id=stop_id)
-        departures = data.get("Departure", [])
-
-        now = datetime.now()
-        result = []
-
-        for departure in departures:
-            line = departure.get("ProductAtStop", {}).get("name", "Okänd linje")
-            direction = departure.get("direction", "Okänd destination")
-            departure_time_str = departure.get("time", None)
-
-            if not departure_time_str:
-                continue
-
-            departure_time = datetime.strptime(departure_time_str, "%H:%M:%S").replace(
-                year=now.year, month=now.month, day=now.day
-            )
-
-            time_remaining = int((departure_time - now).total_seconds() // 60)
-            if time_remaining >= 0:
-                result.append(
-                    {
-                        "Linje": line,
-                        "Destination": direction,
-                        "Tid kvar (min)": time_remaining,
-                    }
-                )
-
-        return sorted(result, key=lambda x: x["Tid kvar (min)"])[:limit]
-
-    def show_one_hour_ahead(self, stop_id: int):
-        data = self.resrobot.get_timetable(location_id=stop_id)
-        departures = data.get("Departure", [])
-
-        now = datetime.now()
-        result = []
-
-        for departure in departures:
-            line = departure.get("ProductAtStop", {}).get("name", "Okänd linje")
-            direction = departure.get("direction", "Okänd destination")
-            departure_time_str = departure.get("time", None)
-
-            if not departure_time_str:
-                continue
-
-            departure_time = datetime.strptime(departure_time_str, "%H:%M:%S").replace(
-                year=now.year, month=now.month, day=now.day
-            )
-
-            time_remaining = int((departure_time - now).total_seconds() // 60)
-            if 0 <= time_remaining <= 60:
-                result.append(
-                    {
-                        "Linje": line,
-                        "Destination": direction,
-                        "Tid kvar (min)": time_remaining,
-                    }
-                )
-
-        return sorted(result, key=lambda x: x["Tid kvar (min)"])
+    def board(self, stop_id, **window) -> DepartureBoard | MergedBoard:
+        """
+        A snapshot of the board of `stop_id` holding at least the departures
+        of `window`, the keyword arguments of `backend.queries.board_params`.
+        """
+        key = tuple(stop_id) if isinstance(stop_id, (list, tuple)) else stop_id
+        boards = [
+            board for board in self._boards.get(key, []) if board.age() <= self.max_age
+        ]
+        for board in boards:
+            if covers(board.window, window):
+                return board
+
+        if isinstance(key, tuple):
+            board = MergedBoard.fetch(self.resrobot, key, **window)
+        else:
+            board = DepartureBoard.fetch(self.resrobot, key, **window)
+        self._boards[key] = boards + [board]
+        return board
+
+    @staticmethod
+    def _row(board, departure, column, value) -> dict:
+        row = {"Linje": departure.line, "Destination": departure.direction}
+        if isinstance(board, MergedBoard):
+            row["Hållplats"] = departure.stop_name or departure.stop_ext_id
+        row[column] = value
+        return row
+
+    def show_departure_from_stop(self, stop_id, products=None):
+        board = self.board(stop_id, products=products)
+        return [
+            self._row(board, departure, "Avgångstid", departure.time or "N/A")
+            for departure in board.departures
+        ]
+
+    def show_time_to_departure(self, stop_id, limit: int = 20, products=None):
+        board = self.board(stop_id, max_journeys=limit, products=products)
+        return [
+            self._row(board, departure, "Tid kvar (min)", time_remaining)
+            for departure, time_remaining in board.upcoming(limit)
+        ]
+
+    def show_one_hour_ahead(self, stop_id, products=None):
+        board = self.board(stop_id, duration=60, products=products)
+        return [
+            self._row(board, departure, "Tid kvar (min)", time_remaining)
+            for departure, time_remaining in board.within(60)
+        ]
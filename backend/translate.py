@@ -50,6 +50,8 @@ def get_translated_texts(lang_code):
         "function_time_left": "Visa tid kvar till avgång",
         "function_one_hour": "Visa avgångar inom en timme",
         "function_limit": "Antal avgångar att visa",
+        "merge_nearby": "Slå ihop med närliggande hållplatser",
+        "live_board": "Live-uppdatering",
         "departures": "Avgångar från",
         "no_departures": "Inga avgångar hittades.",
         "no_stations_found": "Inga matchande hållplatser hittades.",
@@ -73,6 +75,8 @@ def get_translated_texts(lang_code):
         "planner_total_changes": "🔄 Byten",
         "planner_total_time": "⏳ Total restid",
         "planner_no_map": "Ingen karta kunde genereras för denna resa.",
+        "planner_full_day": "Visa alla dagens resor",
+        "planner_sweep_found": "Hittade resor:",
         "insufficient_data_map": "Det finns inte tillräckligt med data för att generera karta.",
         "nearby_header": "Närliggande Hållplatser",
         "nearby_description": "Här visas en karta med närliggande hållplatser baserat på en vald huvudhållplats.",
@@ -81,6 +85,22 @@ def get_translated_texts(lang_code):
         "data_header": "Grafvisning",
         "data_description": "Visualisering av avgångar och ankomster per timme.",
         "no_data": "Inga matchande stationer hittades.",
+        "data_partial": "Ofullständiga data, timmar som saknas:",
+        "data_compare": "Jämför flera stationer",
+        "data_compare_add": "Lägg till i jämförelsen",
+        "data_compare_stations": "Stationer att jämföra",
+        "data_compare_empty": "Sök efter stationer och lägg till dem i jämförelsen.",
+        "data_compare_export": "Exportera som CSV",
+        "delays_header": "Förseningar idag",
+        "delays_board": "Visa förseningar för",
+        "delays_departures": "Avgångar",
+        "delays_arrivals": "Ankomster",
+        "delays_group_by": "Gruppera efter",
+        "delays_by_line": "Linje",
+        "delays_by_operator": "Operatör",
+        "delays_by_hour": "Timme",
+        "delays_by_stop": "Hållplats",
+        "delays_no_data": "Inga realtidsdata finns ännu för den här stationen.",
         "planner_sidebar_title": "🚆 Reseplanering",
         "toggle_show": "Visa fler stationer",
         "toggle_hide": "Visa färre stationer",
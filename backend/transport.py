@@ -0,0 +1,138 @@
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# The base URL can be pointed at a local stand-in, see `utils/mock_server.py`.
+BASE_URL = os.environ.get("RESROBOT_BASE_URL", "https://api.resrobot.se/v2.1")
+
+# (connect, read) timeouts in seconds per endpoint. Trip searches with pass
+# lists are by far the slowest responses ResRobot produces.
+TIMEOUTS = {
+    "trip": (3.05, 20),
+    "journeyDetail": (3.05, 10),
+    "location.name": (3.05, 5),
+    "location.nearbystops": (3.05, 5),
+    "departureBoard": (3.05, 10),
+    "arrivalBoard": (3.05, 10),
+}
+DEFAULT_TIMEOUT = (3.05, 10)
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Longest Retry-After in seconds worth waiting for inside a request; a longer
+# one fails the request instead of holding a worker.
+MAX_RETRY_AFTER = 5.0
+
+
+def timeout_for(endpoint: str) -> tuple[float, float]:
+    """Returns the (connect, read) timeout for a ResRobot endpoint."""
+    return TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT)
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 8.0) -> float:
+    """
+    Exponential backoff with full jitter, so that many workers retrying the
+    same failure do not hit the API again in lockstep.
+    """
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+def retry_after(value) -> float | None:
+    """Parses a Retry-After header given in seconds, if present."""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class Transport:
+    """
+    Shared HTTP transport for the ResRobot API.
+
+    All requests go through one pooled `requests.Session`, so TCP and TLS
+    connections are kept alive and reused between calls instead of being
+    set up again for every departure board.
+
+    Features:
+    - Connection pooling with keep-alive.
+    - Per-endpoint connect/read timeouts, so a slow upstream response can
+      never block a Streamlit worker forever.
+    - Retries with jittered exponential backoff on 429 and 5xx responses,
+      honouring Retry-After when the API sends it; a Retry-After longer
+      than `MAX_RETRY_AFTER` fails the request instead.
+    - gzip negotiation for smaller response bodies.
+    """
+
+    def __init__(self, base_url=BASE_URL, pool_size=20, max_retries=3):
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(
+            {"Accept": "application/json", "Accept-Encoding": "gzip, deflate"}
+        )
+
+    def get(self, endpoint: str, params: dict, stream=False) -> requests.Response:
+        """
+        Sends a GET request to the given endpoint and returns the response.
+        With `stream=True` the body is left unread for the caller to consume.
+        Raises `requests.exceptions.RequestException` once retries are used up.
+        """
+        url = f"{self.base_url}/{endpoint}"
+        timeout = timeout_for(endpoint)
+
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                response = self.session.get(
+                    url, params=params, timeout=timeout, stream=stream
+                )
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+            ):
+                if last_attempt:
+                    raise
+                time.sleep(backoff_delay(attempt))
+                continue
+
+            delay = retry_after(response.headers.get("Retry-After"))
+            if (
+                response.status_code in RETRY_STATUSES
+                and not last_attempt
+                and (delay is None or delay <= MAX_RETRY_AFTER)
+            ):
+                response.close()
+                time.sleep(delay if delay is not None else backoff_delay(attempt))
+                continue
+
+            response.raise_for_status()
+            return response
+
+    def close(self):
+        self.session.close()
+
+
+_shared_transports = {}
+_shared_lock = threading.Lock()
+
+
+def get_transport(base_url=None) -> Transport:
+    """
+    Returns the process-wide transport for a base URL, shared by all ResRobot
+    clients talking to it.
+    """
+    base_url = (base_url or BASE_URL).rstrip("/")
+    with _shared_lock:
+        if base_url not in _shared_transports:
+            _shared_transports[base_url] = Transport(base_url=base_url)
+        return _shared_transports[base_url]
@@ -1,11 +1,22 @@
-from datetime import datetime
+import threading
+from collections import OrderedDict
+from dataclasses import replace
+from datetime import datetime, timedelta
 
 import folium
 import pandas as pd
 
+from backend.async_client import as_completed_sync
 from backend.connect_to_api import ResRobot
+from backend.models import Trip, parse_journey_stops, parse_trips
+from backend.rate_limit import INTERACTIVE, NORMAL
+from backend.singleflight import flights
 
-resrobot = ResRobot()
+
+def _departs_at(trip: Trip) -> datetime:
+    return datetime.strptime(
+        f"{trip.origin.date} {trip.origin.time}", "%Y-%m-%d %H:%M:%S"
+    )
 
 
 class TripPlanner:
@@ -20,79 +31,231 @@ class TripPlanner:
     - Calculates the number of stops and transfers for a trip.
     - Computes the total travel time for a trip.
     - Generates a map of the trip's stops using Folium.
+    - Optionally loads pass lists lazily, one trip at a time.
+    - Sweeps the rest of the day for trips, streaming them in as they arrive.
+    - Shared through `get_trip_planner`, so a search and the pass lists it
+      loaded are reused until the departure-time bucket changes. Sessions
+      loading the same pass lists share one fetch, and only one of them
+      runs the sweep while the others wait for it.
     """
 
-    def __init__(self, origin_id, destination_id) -> None:
+    def __init__(
+        self, origin_id, destination_id, lazy_stops=False, resrobot=None
+    ) -> None:
         """
         Initializes the class with an origin and destination ID,
-        then fetches trip data from ResRobot.
+        then fetches trip data from ResRobot as `Trip` records.
+
+        With `lazy_stops=True` the trip search skips pass lists, which keeps
+        it small and fast. The stops of a trip are then fetched through the
+        legs' journey details the first time that trip needs them, and
+        memoized for the trip.
+
+        `resrobot` is the client to use; a new `ResRobot` is created if none
+        is given.
         """
+        self.resrobot = resrobot or ResRobot()
         self.origin_id = origin_id
         self.destination_id = destination_id
-        response = resrobot.trips(origin_id, destination_id)
-        self.trips = response.get("Trip", []) if response else []
+        self.lazy_stops = lazy_stops
+        self.trips: list[Trip] = self.resrobot.search_trips(
+            origin_id, destination_id, passlist=not lazy_stops
+        )
+        self._stops_loaded = set() if lazy_stops else set(range(len(self.trips)))
+        self._signatures = {trip.signature for trip in self.trips}
+        self.swept = False
+        # Guards `trips`, `_stops_loaded` and `_signatures`; the sweep lock
+        # is held by the one session sweeping.
+        self._lock = threading.Lock()
+        self._sweep_lock = threading.Lock()
+
+    def _trip_with_stops(self, trip_index) -> Trip:
+        """
+        Returns the trip with its pass lists, loading them on first use. The
+        journey details of all legs are fetched concurrently; the trip only
+        counts as loaded once every one of them succeeded.
+        """
+        with self._lock:
+            if trip_index in self._stops_loaded:
+                return self.trips[trip_index]
+        return flights.do(
+            ("trip_stops", id(self), trip_index), lambda: self._load_stops(trip_index)
+        )
+
+    def _load_stops(self, trip_index) -> Trip:
+        with self._lock:
+            trip = self.trips[trip_index]
+        refs = list(
+            {leg.journey_ref for leg in trip.legs if leg.journey_ref and not leg.stops}
+        )
+        resrobot = self.resrobot
+        details = resrobot.gather(*(resrobot.aio.journey_detail(ref) for ref in refs))
+        # A failed fetch leaves its legs as they are, to be retried next time.
+        journey_stops = {
+            ref: parse_journey_stops(detail)
+            for ref, detail in zip(refs, details)
+            if detail is not None
+        }
+        resrobot.stop_store.harvest(
+            stop for stops in journey_stops.values() for stop in stops
+        )
+
+        with self._lock:
+            trip = replace(
+                self.trips[trip_index],
+                legs=tuple(
+                    (
+                        leg.with_journey_stops(journey_stops[leg.journey_ref])
+                        if leg.journey_ref in journey_stops
+                        else leg
+                    )
+                    for leg in self.trips[trip_index].legs
+                ),
+            )
+            self.trips[trip_index] = trip
+            if len(journey_stops) == len(refs):
+                self._stops_loaded.add(trip_index)
+        return trip
+
+    async def _sweep_window(self, start, end, max_pages, priority):
+        """
+        Trips departing in [start, end), and whether every page was fetched.
+        Pages forward with the scroll context of each response until a page
+        reaches the end of the window.
+        """
+        aio = self.resrobot.aio
+        data = await aio.trips(
+            self.origin_id,
+            self.destination_id,
+            passlist=not self.lazy_stops,
+            date=start.strftime("%Y-%m-%d"),
+            time=start.strftime("%H:%M"),
+            priority=priority,
+        )
+        found = []
+        for _ in range(max_pages):
+            page = [trip for trip in parse_trips(data) if trip.legs]
+            found.extend(page)
+            if not page or not data.get("scrF") or _departs_at(page[-1]) >= end:
+                break
+            data = await aio.trips(
+                self.origin_id,
+                self.destination_id,
+                passlist=not self.lazy_stops,
+                context=data["scrF"],
+                priority=priority,
+            )
+
+        trips = [trip for trip in found if start <= _departs_at(trip) < end]
+        return trips, data is not None
+
+    def sweep_today(self, window_minutes=120, max_pages=10):
+        """
+        Fetches every trip departing between now and midnight. The rest of
+        the day is split into windows of `window_minutes`, which are searched
+        concurrently, each paging forward on its own. New trips are appended
+        to `self.trips` (existing indexes stay valid), deduplicated by
+        `Trip.signature`, and the indexes of the new ones are yielded as each
+        window completes, so a page can show the first trips right away.
+        `swept` is set once every window has completed. A caller arriving
+        during another session's sweep waits for it and yields nothing.
+
+        The first window is searched at interactive priority and the others
+        at normal priority, so a sweep leaves room in the rate limit for
+        other sessions. If a page of a window is shed or fails, `swept` stays
+        unset and the next call searches the day again.
+        """
+        with self._sweep_lock:
+            if self.swept:
+                return
+            self.swept = yield from self._sweep(window_minutes, max_pages)
+
+    def _sweep(self, window_minutes, max_pages):
+        now = datetime.now().replace(second=0, microsecond=0)
+        midnight = now.replace(hour=0, minute=0) + timedelta(days=1)
+        starts = []
+        start = now
+        while start < midnight:
+            starts.append(start)
+            start += timedelta(minutes=window_minutes)
+
+        windows = (
+            self._sweep_window(
+                start,
+                min(start + timedelta(minutes=window_minutes), midnight),
+                max_pages,
+                INTERACTIVE if start == now else NORMAL,
+            )
+            for start in starts
+        )
+        complete = True
+        for window_trips, fetched in as_completed_sync(windows):
+            complete = complete and fetched
+            added = []
+            with self._lock:
+                for trip in window_trips:
+                    if trip.signature in self._signatures:
+                        continue
+                    self._signatures.add(trip.signature)
+                    self.trips.append(trip)
+                    if not self.lazy_stops:
+                        self._stops_loaded.add(len(self.trips) - 1)
+                    added.append(len(self.trips) - 1)
+            yield added
+        return complete
+
+    def trips_today(self) -> list[int]:
+        """
+        Indexes of the trips travelling today, in order of departure. Only
+        needs the trip skeletons, so no pass lists are fetched.
+        """
+        today = pd.Timestamp("today").strftime("%Y-%m-%d")
+        with self._lock:
+            trips = list(self.trips)
+        return sorted(
+            (
+                index
+                for index, trip in enumerate(trips)
+                if trip.legs and today in (trip.origin.date, trip.destination.date)
+            ),
+            key=lambda index: _departs_at(trips[index]),
+        )
+
+    def stops_table(self, trip_index=0) -> pd.DataFrame:
+        """The stops of one trip as a DataFrame, one row per passed stop."""
+        trip = self._trip_with_stops(trip_index)
+        return pd.DataFrame(
+            [
+                {
+                    "name": stop.name,
+                    "extId": stop.ext_id,
+                    "lon": stop.lon,
+                    "lat": stop.lat,
+                    "depTime": stop.dep_time or "Not available",
+                    "depDate": stop.dep_date or "Not available",
+                    "arrTime": stop.arr_time or "Not available",
+                    "arrDate": stop.arr_date or "Not available",
+                    "time": stop.time or "Not available",
+                    "date": stop.date or "Not available",
+                    "line": leg.name,
+                }
+                for leg in trip.legs
+                for stop in leg.stops
+            ]
+        )
 
     def next_available_trips_today(self) -> list[pd.DataFrame]:
         trips_today = []
         today = pd.Timestamp("today").strftime("%Y-%m-%d")
 
-        for trip in self.trips:
-            leglist = trip.get("LegList", {}).get("Leg", [])
-            stops_list = []
-            for leg in leglist:
-                line_name = leg.get("name", "Okänd linje")
-
-                stops_container = leg.get("Stops", {})
-                stops = stops_container.get("Stop")
-                if stops:
-                    if isinstance(stops, list):
-                        for stop in stops:
-                            stop["line"] = line_name
-                            stops_list.append(stop)
-                    else:
-                        stops["line"] = line_name
-                        stops_list.append(stops)
-
-            if not stops_list:
+        for trip_index in range(len(self.trips)):
+            df_stops = self.stops_table(trip_index)
+
+            if df_stops.empty:
                 continue
 
-            df_stops = pd.DataFrame(stops_list)
-
-            if "arrTime" in df_stops.columns or "depTime" in df_stops.columns:
-                df_stops["time"] = df_stops.get("arrTime").fillna(
-                    df_stops.get("depTime")
-                )
-            else:
-                df_stops["time"] = "Not available"
-
-            if "arrDate" in df_stops.columns or "depDate" in df_stops.columns:
-                df_stops["date"] = df_stops.get("arrDate").fillna(
-                    df_stops.get("depDate")
-                )
-            else:
-                df_stops["date"] = "Not available"
-
-            if (
-                "date" in df_stops.columns
-                and df_stops["date"].str.contains(today).any()
-            ):
-                required_cols = [
-                    "name",
-                    "extId",
-                    "lon",
-                    "lat",
-                    "depTime",
-                    "depDate",
-                    "arrTime",
-                    "arrDate",
-                    "time",
-                    "date",
-                    "line",
-                ]
-                for col in required_cols:
-                    if col not in df_stops.columns:
-                        df_stops[col] = "Not available"
-                trips_today.append(df_stops[required_cols])
+            if (df_stops["date"] == today).any():
+                trips_today.append(df_stops)
 
         return trips_today
 
@@ -100,45 +263,29 @@ class TripPlanner:
         if not self.trips or trip_index >= len(self.trips):
             return 0
 
-        selected_trip = self.trips[trip_index]
-        total_stops = 0
-        for leg in selected_trip.get("LegList", {}).get("Leg", []):
-            stops = leg.get("Stops", {}).get("Stop")
-            if stops:
-                if isinstance(stops, list):
-                    total_stops += len(stops)
-                else:
-                    total_stops += 1
-        return total_stops
+        trip = self._trip_with_stops(trip_index)
+        return sum(len(leg.stops) for leg in trip.legs)
 
     def calc_number_of_changes(self, trip_index=0):
         if not self.trips or trip_index >= len(self.trips):
             return 0
 
-        selected_trip = self.trips[trip_index]
-        number_of_legs = len(selected_trip.get("LegList", {}).get("Leg", []))
-        number_of_changes = max(0, number_of_legs - 1)
-        return number_of_changes
+        return max(0, len(self.trips[trip_index].legs) - 1)
 
     def calc_total_time(self, trip_index=0):
         if not self.trips:
             return "No trips found"
 
         selected_trip = self.trips[trip_index]
-        legs = selected_trip.get("LegList", {}).get("Leg", [])
-        if not legs:
+        if not selected_trip.legs:
             return "No time data available"
 
-        first_leg = legs[0]
-        last_leg = legs[-1]
-        departure_time = f"{first_leg['Origin']['date']} {first_leg['Origin']['time']}"
-        arrival_time = (
-            f"{last_leg['Destination']['date']} {last_leg['Destination']['time']}"
-        )
+        origin = selected_trip.origin
+        destination = selected_trip.destination
         fmt = "%Y-%m-%d %H:%M:%S"
-        duration = datetime.strptime(arrival_time, fmt) - datetime.strptime(
-            departure_time, fmt
-        )
+        duration = datetime.strptime(
+            f"{destination.date} {destination.time}", fmt
+        ) - datetime.strptime(f"{origin.date} {origin.time}", fmt)
         return str(duration).split(".")[0]
 
     def map_for_trip(self, trip_index=0):
@@ -146,36 +293,67 @@ class TripPlanner:
             print("No valid trip found.")
             return None
 
-        selected_trip = self.trips[trip_index]
-        stops_data = []
-        for leg in selected_trip.get("LegList", {}).get("Leg", []):
-            stops = leg.get("Stops", {}).get("Stop")
-            if stops:
-                if not isinstance(stops, list):
-                    stops = [stops]
-                for stop in stops:
-                    stop_data = {
-                        "name": stop.get("name", "Unknown"),
-                        "lat": float(stop.get("lat", 0)),
-                        "lon": float(stop.get("lon", 0)),
-                        "arr_time": stop.get("arrTime", "Not available"),
-                        "dep_time": stop.get("depTime", "Not available"),
-                    }
-                    stops_data.append(stop_data)
-
-        if not stops_data:
+        trip = self._trip_with_stops(trip_index)
+        stops = [stop for leg in trip.legs for stop in leg.stops]
+        if not stops:
             print("No stops data found.")
             return None
 
-        df_stops = pd.DataFrame(stops_data)
-        map_center = [df_stops["lat"].mean(), df_stops["lon"].mean()]
+        map_center = [
+            sum(stop.lat for stop in stops) / len(stops),
+            sum(stop.lon for stop in stops) / len(stops),
+        ]
         trip_map = folium.Map(location=map_center, zoom_start=6)
 
-        for _, row in df_stops.iterrows():
+        for stop in stops:
             folium.Marker(
-                location=[row["lat"], row["lon"]],
-                popup=f"<b>{row['name']}</b><br>Arr: {row['arr_time']}<br>Dep: {row['dep_time']}",
+                location=[stop.lat, stop.lon],
+                popup=(
+                    f"<b>{stop.name}</b>"
+                    f"<br>Arr: {stop.arr_time or 'Not available'}"
+                    f"<br>Dep: {stop.dep_time or 'Not available'}"
+                ),
                 icon=folium.Icon(color="blue"),
             ).add_to(trip_map)
 
         return trip_map
+
+
+_planners = OrderedDict()
+_planners_lock = threading.Lock()
+
+
+def get_trip_planner(
+    resrobot, origin_id, destination_id, lazy_stops=False, bucket_minutes=10, size=64
+) -> TripPlanner:
+    """
+    The shared `TripPlanner` of an origin and destination for the current
+    departure-time bucket of `bucket_minutes`. Rerunning a page, switching
+    between its trips or opening a map reuses the search and every pass
+    list already loaded; a new search is made once the bucket has passed.
+    The `size` most recently used planners are kept.
+    """
+    now = datetime.now()
+    bucket = now.replace(
+        minute=now.minute - now.minute % bucket_minutes, second=0, microsecond=0
+    )
+    key = (
+        resrobot.transport.base_url,
+        str(origin_id),
+        str(destination_id),
+        lazy_stops,
+        bucket,
+    )
+    with _planners_lock:
+        planner = _planners.get(key)
+        if planner is not None:
+            _planners.move_to_end(key)
+            return planner
+
+    planner = TripPlanner(origin_id, destination_id, lazy_stops, resrobot)
+    with _planners_lock:
+        planner = _planners.setdefault(key, planner)
+        _planners.move_to_end(key)
+        while len(_planners) > size:
+            _planners.popitem(last=False)
+    return planner
@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import CancelledError
+
+import streamlit as st
+
+from backend.async_client import submit
+from backend.models import StopLocation, parse_stop_locations
+from backend.stop_index import normalize
+from backend.stops import Stops
+
+
+class Typeahead:
+    """
+    Incremental stop search behind one search box of one session.
+
+    Features:
+    - Narrows the previous keystroke's candidates when the query grows,
+      with the same results as a fresh search (see `StopIndex.narrow`).
+    - Memoizes the results of each distinct query, so going back over a
+      prefix and the API lookup for it are never repeated.
+    - Debounces API lookups, which only run when the local index has no hit.
+    - Cancels an API lookup that a newer keystroke made stale.
+    - Returns the `limit` best results, best first.
+    """
+
+    def __init__(self, stops: Stops, limit=10, threshold=80, debounce=0.25):
+        self.stops = stops
+        self.limit = limit
+        self.threshold = threshold
+        self.debounce = debounce
+
+        self._memo = OrderedDict()
+        self._memo_size = 256
+        self._candidates = None
+        self._generation = 0
+        self._pending = None
+        self._lock = threading.Lock()
+
+    def search(self, query: str) -> list[StopLocation]:
+        """
+        The best matching stops for `query`. Returns an empty list when a
+        newer search replaced this one while it waited for the API, or when
+        the API lookup failed; failed lookups are not memoized.
+        """
+        text = normalize(query)
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            if self._pending is not None:
+                self._pending.cancel()
+                self._pending = None
+            if not text:
+                return []
+            if text in self._memo:
+                self._memo.move_to_end(text)
+                return self._memo[text]
+            results = self._search_index(text)
+
+        if not results:
+            results = self._search_api(query, generation)
+            if results is None:
+                return []
+
+        with self._lock:
+            self._remember(text, results)
+        return results
+
+    def _search_index(self, text) -> list[StopLocation]:
+        index = self.stops.index
+        if index is None:
+            return []
+        results, self._candidates = index.narrow(
+            text, self._candidates, self.threshold, self.limit
+        )
+        return results
+
+    def _search_api(self, query, generation) -> list[StopLocation] | None:
+        time.sleep(self.debounce)
+        with self._lock:
+            if generation != self._generation:
+                return None
+            pending = submit(self.stops.resrobot.aio.get_location_info(query))
+            self._pending = pending
+
+        try:
+            data = pending.result()
+        except CancelledError:
+            return None
+        if data is None:
+            return None
+
+        results = self.stops.rank_by_name(
+            query, parse_stop_locations(data), self.threshold
+        )[: self.limit]
+        with self._lock:
+            if self._pending is pending:
+                self._pending = None
+            if generation != self._generation:
+                # Still worth keeping for when the user types it again.
+                self._remember(normalize(query), results)
+                return None
+        return results
+
+    def _remember(self, text, results):
+        self._memo[text] = results
+        self._memo.move_to_end(text)
+        while len(self._memo) > self._memo_size:
+            self._memo.popitem(last=False)
+
+
+def session_typeahead(stops: Stops, key: str) -> Typeahead:
+    """The `Typeahead` of the current Streamlit session for the input `key`."""
+    state_key = f"typeahead_{key}"
+    if state_key not in st.session_state:
+        st.session_state[state_key] = Typeahead(stops)
+    return st.session_state[state_key]
@@ -1,8 +1,15 @@
+import threading
+from datetime import date
+from functools import lru_cache
+from io import BytesIO
+
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 import seaborn as sns
 
-from backend.resrobot_day import ResRobotDay
+from backend.histograms import get_station_histogram, hourly_matrix
+from backend.resrobot_day import get_default_resrobot_day
 
 """
 Functions for preparing and visualizing transport data. This
@@ -11,58 +18,128 @@ generates a bar chart displaying the number of departures and arrivals per hour
 
 Features:
 - Fetch real-time departures and arrivals from the ResRobot API.
-- Process and aggregate data into hourly counts.
+- Process and aggregate data into hourly counts, updated incrementally.
 - Generate a bar chart using Matplotlib and Seaborn.
+- Compare many stations hour by hour in one heatmap.
 """
 
 
-def prepare_and_plot_graph(station_id):
-    rr_today = ResRobotDay()
+def prepare_and_plot_graph(station_id, resrobot=None):
+    """
+    The PNG of today's departures and arrivals per hour at a station, and
+    the hours it has no data for, which are shaded in the figure.
+    Only events not counted before are added to the station's histogram,
+    and the figure is rendered again only when the histogram changed.
+    """
+    histogram = get_station_histogram(station_id, date.today().isoformat())
+    df_dep, df_arr = get_default_resrobot_day(
+        resrobot
+    ).departures_and_arrivals_until_now(station_id)
+    histogram.update(df_dep, df_arr)
+    departures, arrivals = histogram.counts()
+    missing = sorted(
+        set(df_dep.attrs.get("missing_hours", []))
+        | set(df_arr.attrs.get("missing_hours", []))
+    )
+    png = _render_graph(
+        str(station_id),
+        histogram.date,
+        histogram.version,
+        tuple(departures.tolist()),
+        tuple(arrivals.tolist()),
+        tuple(missing),
+    )
+    return png, missing
+
+
+# Matplotlib is not thread-safe; figures are drawn and saved under this lock.
+_render_lock = threading.Lock()
 
-    df_dep = rr_today.departures_until_now(station_id)
-    df_arr = rr_today.arrivals_until_now(station_id)
 
-    if not df_dep.empty and "time" in df_dep.columns:
-        df_dep["Hour"] = df_dep["time"].str.split(":").str[0].astype(int)
-        dep_count_by_hour = df_dep["Hour"].value_counts().sort_index()
-    else:
-        dep_count_by_hour = pd.Series([0] * 24, index=range(24))
+def _png(fig) -> bytes:
+    """Saves and closes a figure; call with `_render_lock` held."""
+    buffer = BytesIO()
+    fig.savefig(buffer, format="png")
+    plt.close(fig)
+    return buffer.getvalue()
 
-    if not df_arr.empty and "time" in df_arr.columns:
-        df_arr["Hour"] = df_arr["time"].str.split(":").str[0].astype(int)
-        arr_count_by_hour = df_arr["Hour"].value_counts().sort_index()
-    else:
-        arr_count_by_hour = pd.Series([0] * 24, index=range(24))
 
-    hours = range(24)
-    df_hours = pd.DataFrame(
+@lru_cache(maxsize=64)
+def _render_graph(station_id, day, version, departures, arrivals, missing=()):
+    """
+    Renders the graph of one version of a station's histogram, with the
+    `missing` hours shaded as gaps rather than drawn as 0, as PNG bytes.
+    Sessions share the bytes rather than a `Figure`, which matplotlib could
+    not draw from several threads at once.
+    """
+    df_long = pd.DataFrame(
         {
-            "Hour": hours,
-            "Departures": [dep_count_by_hour.get(hour, 0) for hour in hours],
-            "Arrivals": [arr_count_by_hour.get(hour, 0) for hour in hours],
+            "Hour": list(range(24)) * 2,
+            "Type": ["Departures"] * 24 + ["Arrivals"] * 24,
+            "Count": departures + arrivals,
         }
-    ).set_index("Hour")
-
-    df_long = df_hours.reset_index().melt(
-        id_vars="Hour",
-        value_vars=["Departures", "Arrivals"],
-        var_name="Type",
-        value_name="Count",
     )
 
-    sns.set(style="whitegrid")
-    plt.figure(figsize=(14, 7))
-    sns.barplot(
-        x="Hour",
-        y="Count",
-        hue="Type",
-        data=df_long,
-        palette={"Departures": "skyblue", "Arrivals": "orange"},
+    with _render_lock:
+        sns.set(style="whitegrid")
+        fig, ax = plt.subplots(figsize=(14, 7))
+        sns.barplot(
+            x="Hour",
+            y="Count",
+            hue="Type",
+            data=df_long,
+            palette={"Departures": "skyblue", "Arrivals": "orange"},
+            ax=ax,
+        )
+        for hour in missing:
+            ax.axvspan(
+                hour - 0.5, hour + 0.5, facecolor="none", hatch="xx", edgecolor="grey"
+            )
+        ax.set_title("Avgångar & Ankomster per Timme (idag, 0..nu)", fontsize=16)
+        ax.set_xlabel("Timme (0-23)", fontsize=14)
+        ax.set_ylabel("Antal", fontsize=14)
+        ax.legend(title="Typ")
+        fig.tight_layout()
+        png = _png(fig)
+    return png
+
+
+def prepare_station_matrix(station_ids, labels=None, board="departure", resrobot=None):
+    """
+    Today's departures (or arrivals) per hour of many stations, as a
+    stations x 24 DataFrame. The boards are fetched in one batch; the
+    hours without data are NaN rather than 0, and `attrs["pending"]` tells
+    whether later calls will still fetch some of them.
+    """
+    frames = get_default_resrobot_day(resrobot).boards_until_now(station_ids, board)
+    matrix = hourly_matrix(frames).astype(float)
+    for row, frame in enumerate(frames):
+        matrix[row, frame.attrs.get("missing_hours", [])] = np.nan
+    matrix = pd.DataFrame(
+        matrix,
+        index=pd.Index(
+            labels or [str(station) for station in station_ids], name="Station"
+        ),
+        columns=pd.RangeIndex(24, name="Timme"),
     )
-    plt.title("Avgångar & Ankomster per Timme (idag, 0..nu)", fontsize=16)
-    plt.xlabel("Timme (0-23)", fontsize=14)
-    plt.ylabel("Antal", fontsize=14)
-    plt.legend(title="Typ")
-    plt.tight_layout()
+    matrix.attrs["pending"] = any(frame.attrs.get("pending_hours") for frame in frames)
+    return matrix
+
 
-    return plt
+def plot_station_heatmap(matrix: pd.DataFrame) -> bytes:
+    """
+    PNG of the heatmap of a matrix from `prepare_station_matrix`, with the
+    hours without data left as hatched, empty cells.
+    """
+    with _render_lock:
+        fig, ax = plt.subplots(figsize=(14, max(3, 0.4 * len(matrix) + 2)))
+        ax.patch.set(hatch="xx", edgecolor="lightgrey")
+        sns.heatmap(
+            matrix, cmap="YlOrRd", linewidths=0.5, ax=ax, cbar_kws={"label": "Antal"}
+        )
+        ax.set_title("Trafik per station och timme (idag, 0..nu)", fontsize=16)
+        ax.set_xlabel("Timme (0-23)", fontsize=14)
+        ax.set_ylabel("")
+        fig.tight_layout()
+        png = _png(fig)
+    return png
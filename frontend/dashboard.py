@@ -1,14 +1,33 @@
 import streamlit as st
 
+from backend.cache import ResponseCache, SQLiteCache
 from backend.connect_to_api import ResRobot
 from backend.helpers import get_video_as_base64, load_css
+from backend.rate_limit import get_default_limiter
 from backend.translate import LANGUAGES, get_translated_texts
 from frontend.tabs.data import DataPage
 from frontend.tabs.nearby_stops import NearbyStopsPage
 from frontend.tabs.timetable import TimetablePage
 from frontend.tabs.travel_planner import TravelPlannerPage
+from utils.constants import CACHE_PATH
 
-resrobot = ResRobot()
+
+@st.cache_resource
+def get_response_cache():
+    """One on-disk response cache shared by all sessions and reruns."""
+    return ResponseCache(SQLiteCache(CACHE_PATH))
+
+
+@st.cache_resource
+def get_rate_limiter():
+    """
+    One limiter for the access key, with the monthly count kept on disk. It
+    is the process-wide default, so clients created without one share it.
+    """
+    return get_default_limiter()
+
+
+resrobot = ResRobot(cache=get_response_cache(), limiter=get_rate_limiter())
 
 load_css("frontend/styles.css")
 
@@ -3,8 +3,8 @@ from abc import ABC, abstractmethod
 import folium
 import streamlit as st
 
-from backend.connect_to_api import ResRobot
-from backend.trips import TripPlanner
+from backend.stops import Stops
+from backend.trips import get_trip_planner
 
 """
 Module for handling map-related operations in the application.
@@ -15,12 +15,12 @@ for map operations and implementations for trip maps and nearby stop maps.
 Features:
 - Abstract base class `Maps` for defining map display behavior.
 - `TripMap` class for visualizing planned trips on a map.
-- Functions for retrieving coordinates and nearby stops via ResRobot API.
+- Functions for retrieving coordinates and nearby stops through a `Stops`
+  client, from the local stop indexes when available and otherwise via
+  ResRobot API.
 - Functions for generating interactive Folium maps with stop markers.
 """
 
-api_client = ResRobot()
-
 
 class Maps(ABC):
     """
@@ -43,9 +43,9 @@ class Maps(ABC):
 
 
 class TripMap(Maps):
-    def __init__(self, origin_id, destination_id):
-        trip_planner = TripPlanner(origin_id, destination_id)
-        self.next_trip = trip_planner.next_available_trip()
+    def __init__(self, origin_id, destination_id, resrobot):
+        trip_planner = get_trip_planner(resrobot, origin_id, destination_id)
+        self.next_trip = trip_planner.stops_table(0)
 
     def _create_map(self):
         geographical_map = folium.Map(
@@ -69,44 +69,32 @@ class TripMap(Maps):
         st.components.v1.html(self._create_map()._repr_html_(), height=500)
 
 
-def get_coordinates_from_extid(ext_id):
+def get_coordinates_from_extid(ext_id, stops_client: Stops):
 
-    stop_data = api_client.get_location_info(ext_id)
+    stop = stops_client.get_stop_info(ext_id)
 
-    if not stop_data or "stopLocationOrCoordLocation" not in stop_data:
+    if stop is None:
         return None
 
-    for stop in stop_data["stopLocationOrCoordLocation"]:
-        stop_info = list(stop.values())[0]
-        return {
-            "name": stop_info.get("name"),
-            "lat": float(stop_info.get("lat")),
-            "lon": float(stop_info.get("lon")),
-        }
-    return None
+    return {"name": stop.name, "lat": stop.lat, "lon": stop.lon}
 
 
-def get_nearby_stops(ext_id, radius=1000):
+def get_nearby_stops(ext_id, stops_client: Stops, radius=1000):
 
-    base_stop = get_coordinates_from_extid(ext_id)
+    base_stop = get_coordinates_from_extid(ext_id, stops_client)
 
     if not base_stop:
         return None
 
-    nearby_stops = api_client.get_nearby_stops(
+    nearby_stops = stops_client.find_nearby_stops(
         base_stop["lat"], base_stop["lon"], radius
     )
 
-    if not nearby_stops or "stopLocationOrCoordLocation" not in nearby_stops:
+    if not nearby_stops:
         return None
 
     stop_list = [
-        {
-            "name": stop["StopLocation"]["name"],
-            "lat": float(stop["StopLocation"]["lat"]),
-            "lon": float(stop["StopLocation"]["lon"]),
-        }
-        for stop in nearby_stops["stopLocationOrCoordLocation"]
+        {"name": stop.name, "lat": stop.lat, "lon": stop.lon} for stop in nearby_stops
     ]
 
     return {
@@ -1,7 +1,15 @@
+from datetime import date
+
 import streamlit as st
-from Graphs import prepare_and_plot_graph
+from Graphs import plot_station_heatmap, prepare_and_plot_graph, prepare_station_matrix
 
+from backend.delays import get_delay_tracker
+from backend.resrobot_day import get_default_resrobot_day
 from backend.stops import Stops
+from backend.typeahead import session_typeahead
+
+# Seconds between refreshes of a heatmap whose hours are still being fetched.
+COMPARE_TICK = 15
 
 
 class DataPage:
@@ -15,6 +23,9 @@ class DataPage:
     - Search for transport stops by name.
     - Select a stop from search results.
     - Display a graph of arrivals and departures.
+    - Display today's delays and cancellations per line, operator, hour or
+      stop.
+    - Compare many stations hour by hour in a heatmap, exportable as CSV.
     """
 
     def __init__(self, lang_texts, resrobot):
@@ -31,18 +42,154 @@ class DataPage:
             self.lang_texts["enter_station"], key="station_search"
         )
         station_id = None
+        station_name = None
+        compare = st.sidebar.toggle(
+            self.lang_texts.get("data_compare", "Jämför flera stationer"),
+            key="data_compare",
+        )
 
         if location_query:
-            results = self.stops.search_stop_by_name(location_query)
+            results = session_typeahead(self.stops, "station_search").search(
+                location_query
+            )
             if results:
-                stop_options = {res["name"]: res["extId"] for res in results}
+                stop_options = {res.name: res.ext_id for res in results}
                 selected_station = st.sidebar.selectbox(
                     self.lang_texts["choose_stop"], list(stop_options.keys())
                 )
                 station_id = stop_options[selected_station]
+                station_name = selected_station
             else:
                 st.sidebar.warning(self.lang_texts["no_data"])
 
-        if station_id:
-            plot = prepare_and_plot_graph(station_id)
-            st.pyplot(plot)
+        if compare:
+            self.display_comparison(station_name, station_id)
+        elif station_id:
+            plot, missing = prepare_and_plot_graph(station_id, self.resrobot)
+            if missing:
+                st.warning(self.partial_text(missing))
+            st.image(plot, use_container_width=True)
+            self.display_delays(station_id)
+
+    def partial_text(self, hours):
+        """Warning listing the hours a chart is still missing."""
+        return "{} {}".format(
+            self.lang_texts.get(
+                "data_partial", "Ofullständiga data, timmar som saknas:"
+            ),
+            ", ".join(str(hour) for hour in hours),
+        )
+
+    def display_comparison(self, station_name, station_id):
+        """Heatmap of the hourly traffic of the stations added to the comparison."""
+        stations = st.session_state.setdefault("data_stations", {})
+        if station_id and st.sidebar.button(
+            self.lang_texts.get("data_compare_add", "Lägg till i jämförelsen")
+        ):
+            stations[station_name] = station_id
+
+        selected = st.sidebar.multiselect(
+            self.lang_texts.get("data_compare_stations", "Stationer att jämföra"),
+            list(stations),
+            default=list(stations),
+        )
+        for name in [name for name in stations if name not in selected]:
+            del stations[name]
+        if not stations:
+            st.info(
+                self.lang_texts.get(
+                    "data_compare_empty",
+                    "Sök efter stationer och lägg till dem i jämförelsen.",
+                )
+            )
+            return
+
+        boards = {
+            self.lang_texts.get("delays_departures", "Avgångar"): "departure",
+            self.lang_texts.get("delays_arrivals", "Ankomster"): "arrival",
+        }
+        board = boards[st.radio(" ", list(boards), horizontal=True)]
+
+        # Each call only fetches the windows the background budget allows,
+        # so stations the collector has not recorded fill in over several
+        # refreshes; the fragment refreshes itself until nothing is pending.
+        pending = st.session_state.get("data_compare_pending", True)
+
+        @st.fragment(run_every=COMPARE_TICK if pending else None)
+        def heatmap():
+            matrix = prepare_station_matrix(
+                list(stations.values()),
+                labels=list(stations),
+                board=board,
+                resrobot=self.resrobot,
+            )
+            missing = matrix.columns[matrix.isna().any()].tolist()
+            if missing:
+                st.warning(self.partial_text(missing))
+            st.image(plot_station_heatmap(matrix), use_container_width=True)
+            st.download_button(
+                self.lang_texts.get("data_compare_export", "Exportera som CSV"),
+                matrix.to_csv().encode("utf-8"),
+                file_name=f"trafik_per_timme_{board}_{date.today().isoformat()}.csv",
+                mime="text/csv",
+            )
+            if matrix.attrs["pending"] != pending:
+                st.session_state["data_compare_pending"] = matrix.attrs["pending"]
+                st.rerun()
+
+        heatmap()
+
+    def display_delays(self, station_id):
+        """Delay statistics of today's departures or arrivals."""
+        st.markdown(f"## {self.lang_texts.get('delays_header', 'Förseningar idag')}")
+        boards = {
+            self.lang_texts.get("delays_departures", "Avgångar"): "departure",
+            self.lang_texts.get("delays_arrivals", "Ankomster"): "arrival",
+        }
+        groups = {
+            self.lang_texts.get("delays_by_line", "Linje"): "line",
+            self.lang_texts.get("delays_by_operator", "Operatör"): "operator",
+            self.lang_texts.get("delays_by_hour", "Timme"): "hour",
+            self.lang_texts.get("delays_by_stop", "Hållplats"): "stop",
+        }
+        columns = st.columns(2)
+        board = boards[
+            columns[0].radio(
+                self.lang_texts.get("delays_board", "Visa förseningar för"),
+                list(boards),
+                horizontal=True,
+            )
+        ]
+        by = groups[
+            columns[1].selectbox(
+                self.lang_texts.get("delays_group_by", "Gruppera efter"), list(groups)
+            )
+        ]
+
+        frame = get_default_resrobot_day(self.resrobot).board_until_now(
+            station_id, board
+        )
+        tracker = get_delay_tracker(station_id, board, date.today().isoformat())
+        tracker.update(frame)
+        summary = tracker.summary(by)
+        if summary.empty or not summary["timed"].any():
+            st.info(
+                self.lang_texts.get(
+                    "delays_no_data",
+                    "Inga realtidsdata finns ännu för den här stationen.",
+                )
+            )
+            return
+
+        summary = summary.assign(cancel_rate=summary["cancel_rate"] * 100)
+        st.dataframe(
+            summary.rename(
+                columns={
+                    "events": "Antal",
+                    "timed": "Med realtid",
+                    "mean": "Medel (min)",
+                    "cancel_rate": "Inställda (%)",
+                }
+            ).round(1),
+            use_container_width=True,
+        )
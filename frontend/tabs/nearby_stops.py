@@ -2,6 +2,7 @@ import streamlit as st
 from streamlit.components.v1 import html
 
 from backend.stops import Stops
+from backend.typeahead import session_typeahead
 from frontend.plot_maps import create_map_with_stops, get_nearby_stops
 
 
@@ -35,9 +36,11 @@ class NearbyStopsPage:
         ext_id = None
 
         if location_query:
-            results = self.stops.search_stop_by_name(location_query)
+            results = session_typeahead(self.stops, "station_search").search(
+                location_query
+            )
             if results:
-                stop_options = {res["name"]: res["extId"] for res in results}
+                stop_options = {res.name: res.ext_id for res in results}
                 selected_stop = st.sidebar.selectbox(
                     self.lang_texts["choose_stop"], list(stop_options.keys())
                 )
@@ -55,7 +58,7 @@ class NearbyStopsPage:
 
         if ext_id:
             try:
-                stops_data = get_nearby_stops(ext_id, radius=radius)
+                stops_data = get_nearby_stops(ext_id, self.stops, radius=radius)
                 folium_map = create_map_with_stops(stops_data)
                 html(folium_map._repr_html_(), height=600)
             except Exception as e:
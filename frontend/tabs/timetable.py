@@ -1,7 +1,17 @@
 import streamlit as st
 
+from backend.live_board import LiveView, get_live_board
 from backend.stops import Stops
 from backend.timetable import TimeTable
+from backend.typeahead import session_typeahead
+
+# Station groups are the selected stop and at most seven stops around it.
+GROUP_RADIUS = 300
+GROUP_SIZE = 8
+
+# Seconds between redraws of the live board. The shared poller decides
+# whether a redraw also fetches.
+LIVE_TICK = 10
 
 
 class TimetablePage:
@@ -15,6 +25,9 @@ class TimetablePage:
     - Search for transport stops by name.
     - Select different timetable functions (departures, time left, one hour ahead).
     - Display departure data in a structured table.
+    - Optionally merge the boards of nearby stops into one station board.
+    - A live mode that refreshes the board by itself and highlights the
+      departures whose realtime data changed.
     """
 
     def __init__(self, lang_texts, resrobot):
@@ -22,6 +35,51 @@ class TimetablePage:
         self.resrobot = resrobot
         self.stops = Stops(self.resrobot)
 
+    def _station_group(self, stop):
+        """
+        The stop and its closest neighbours, whose boards are merged into one.
+        Falls back to the stop alone when it has no neighbours.
+        """
+        nearby = self.stops.find_nearby_stops(stop.lat, stop.lon, GROUP_RADIUS)
+        group = [stop.ext_id] + [
+            other.ext_id for other in nearby if other.ext_id != stop.ext_id
+        ]
+        group = group[:GROUP_SIZE]
+        return group if len(group) > 1 else stop.ext_id
+
+    def _display_live(self, station_id):
+        """
+        Shows the live board in a fragment that reruns every `LIVE_TICK`
+        seconds, without rerunning the rest of the page. Each session keeps
+        a `LiveView` of the shared board and applies only its changes.
+        """
+        key = f"live_view_{station_id}"
+        if key not in st.session_state:
+            live_board = get_live_board(self.resrobot, station_id)
+            st.session_state[key] = LiveView(live_board)
+        view = st.session_state[key]
+
+        @st.fragment(run_every=LIVE_TICK)
+        def live_table():
+            view.refresh()
+            frame = view.frame()
+            if frame.empty:
+                st.write(self.lang_texts["no_departures"])
+                return
+            changed = frame.pop("changed")
+            st.dataframe(
+                frame.style.apply(
+                    lambda row: [
+                        "background-color: #fff3b0" if changed[row.name] else ""
+                    ]
+                    * len(row),
+                    axis=1,
+                ),
+                hide_index=True,
+            )
+
+        live_table()
+
     def display_timetable(self):
 
         st.markdown(f"# {self.lang_texts['departure_header']}")
@@ -42,24 +100,41 @@ class TimetablePage:
         selected_function = st.sidebar.selectbox(
             self.lang_texts["function_select"], list(function_options.keys())
         )
+        live = st.sidebar.toggle(
+            self.lang_texts.get("live_board", "Live-uppdatering"), key="live_board"
+        )
+        merge_nearby = st.sidebar.toggle(
+            self.lang_texts.get("merge_nearby", "Slå ihop med närliggande hållplatser"),
+            key="merge_nearby",
+        )
 
         station_id = None
         selected_stop = None
 
         if location_query:
-            results = self.stops.search_stop_by_name(location_query)
+            results = session_typeahead(self.stops, "station_search").search(
+                location_query
+            )
             if results:
-                stop_options = {res["name"]: res["extId"] for res in results}
+                stop_options = {res.name: res for res in results}
                 selected_stop = st.sidebar.selectbox(
                     self.lang_texts["choose_stop"],
                     list(stop_options.keys()),
                 )
-                station_id = stop_options[selected_stop]
+                station_id = stop_options[selected_stop].ext_id
+                if merge_nearby:
+                    station_id = self._station_group(stop_options[selected_stop])
             else:
                 st.sidebar.warning(self.lang_texts["no_stations_found"])
 
-        if station_id and selected_stop:
-            timetable = TimeTable(self.resrobot)
+        if station_id and selected_stop and live:
+            st.subheader(f"{self.lang_texts['table_subheader']} {selected_stop}")
+            self._display_live(station_id)
+        elif station_id and selected_stop:
+            # Kept per session, so switching view reuses the fetched board.
+            if "timetable" not in st.session_state:
+                st.session_state["timetable"] = TimeTable(self.resrobot)
+            timetable = st.session_state["timetable"]
 
             if selected_function == self.lang_texts["function_departures"]:
                 departures = timetable.show_departure_from_stop(station_id)
@@ -3,7 +3,8 @@ import os
 import streamlit as st
 
 from backend.stops import Stops
-from backend.trips import TripPlanner
+from backend.trips import get_trip_planner
+from backend.typeahead import session_typeahead
 
 
 class TravelPlannerPage:
@@ -26,6 +27,29 @@ class TravelPlannerPage:
         self.resrobot = resrobot
         self.stops = Stops(self.resrobot)
 
+    @staticmethod
+    def _trip_label(trip):
+        return f"{trip.origin.time} ({trip.origin.date})"
+
+    def _sweep_day(self, trip_planner):
+        """
+        Runs the full-day sweep, listing the trips found so far while the
+        remaining time windows are still being fetched.
+        """
+        progress = st.empty()
+        found_text = self.lang_texts.get("planner_sweep_found", "Hittade resor:")
+        for _ in trip_planner.sweep_today():
+            trips_today = trip_planner.trips_today()
+            with progress.container():
+                st.caption(f"{found_text} {len(trips_today)}")
+                st.text(
+                    "\n".join(
+                        self._trip_label(trip_planner.trips[index])
+                        for index in trips_today
+                    )
+                )
+        progress.empty()
+
     def display_travel_planner(self):
         st.markdown(f"# {self.lang_texts['planner_header']}")
         st.sidebar.subheader(self.lang_texts["planner_sidebar_title"])
@@ -36,6 +60,10 @@ class TravelPlannerPage:
         destination_input = st.sidebar.text_input(
             self.lang_texts["planner_destination"], key="destination_search"
         )
+        full_day = st.sidebar.toggle(
+            self.lang_texts.get("planner_full_day", "Visa alla dagens resor"),
+            key="planner_full_day",
+        )
 
         if not origin_input or not destination_input:
             st.info(
@@ -48,9 +76,11 @@ class TravelPlannerPage:
 
         origin_id, destination_id = None, None
 
-        results_origin = self.stops.search_stop_by_name(origin_input)
+        results_origin = session_typeahead(self.stops, "origin_search").search(
+            origin_input
+        )
         if results_origin:
-            origin_options = {res["name"]: res["extId"] for res in results_origin}
+            origin_options = {res.name: res.ext_id for res in results_origin}
             selected_origin = st.sidebar.selectbox(
                 self.lang_texts["planner_select_origin"], list(origin_options.keys())
             )
@@ -63,11 +93,11 @@ class TravelPlannerPage:
                 )
             )
 
-        results_destination = self.stops.search_stop_by_name(destination_input)
+        results_destination = session_typeahead(
+            self.stops, "destination_search"
+        ).search(destination_input)
         if results_destination:
-            destination_options = {
-                res["name"]: res["extId"] for res in results_destination
-            }
+            destination_options = {res.name: res.ext_id for res in results_destination}
             selected_destination = st.sidebar.selectbox(
                 self.lang_texts["planner_select_destination"],
                 list(destination_options.keys()),
@@ -82,17 +112,22 @@ class TravelPlannerPage:
             )
 
         if origin_id and destination_id:
-            trip_planner = TripPlanner(origin_id, destination_id)
-            trips_today = trip_planner.next_available_trips_today()
+            trip_planner = get_trip_planner(
+                self.resrobot, origin_id, destination_id, lazy_stops=True
+            )
+            if full_day and not trip_planner.swept:
+                self._sweep_day(trip_planner)
+            trips_today = trip_planner.trips_today()
             if trips_today:
                 st.subheader(self.lang_texts["planner_choose_trip"])
 
-                selected_trip_index = st.selectbox(
+                selected = st.selectbox(
                     self.lang_texts["planner_select_trip"],
                     options=list(range(len(trips_today))),
-                    format_func=lambda i: f"Resa {i+1} - {trips_today[i]['time'].iloc[0]} ({trips_today[i]['date'].iloc[0]})",
+                    format_func=lambda i: f"Resa {i+1} - {self._trip_label(trip_planner.trips[trips_today[i]])}",
                 )
-                df_trip = trips_today[selected_trip_index]
+                selected_trip_index = trips_today[selected]
+                df_trip = trip_planner.stops_table(selected_trip_index)
                 if df_trip is not None and not df_trip.empty:
                     st.subheader(self.lang_texts["planner_trip_info"])
 
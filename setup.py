@@ -21,5 +21,11 @@ setup(
     packages=find_packages(
         include=["backend*", "frontend*", "utils*"], exclude=("test*", "explorations")
     ),
-    entry_points={"console_scripts": ["dashboard = utils.run_dashboard:run_dashboard"]},
+    entry_points={
+        "console_scripts": [
+            "dashboard = utils.run_dashboard:run_dashboard",
+            "mock_resrobot = utils.mock_server:main",
+            "collector = utils.collector:main",
+        ]
+    },
 )
@@ -0,0 +1,51 @@
+from backend.cache import MemoryCache, ResponseCache
+from backend.connect_to_api import ResRobot
+from backend.timetable import TimeTable
+from utils.constants import FIXTURES_PATH
+from utils.mock_server import MockResRobot
+
+
+def offline_client(mock):
+    return ResRobot(
+        api_key="offline",
+        base_url=mock.base_url,
+        cache=ResponseCache(MemoryCache()),
+    )
+
+
+def main():
+    # The synthetic fixtures in tests/fixtures cover a departureBoard, a trip
+    # and a location.name; more can be recorded with:
+    # python -m utils.mock_server --mode record
+    if not any(FIXTURES_PATH.glob("*/*.json")):
+        print(f"Inga fixtures hittades i {FIXTURES_PATH}, spela in dem först.")
+        return
+
+    with MockResRobot(loose=True, latency_ms=50, error_rate=0.2) as mock:
+        resrobot = offline_client(mock)
+        timetable = TimeTable(resrobot)
+
+        stop_id = 740000002  # Göteborg Centralstation
+        departures = timetable.show_departure_from_stop(stop_id)
+        print(f"Avgångar från mock-servern: {len(departures)}")
+        for dep in departures[:5]:
+            print(dep)
+
+        trips = resrobot.search_trips(740000195, stop_id)  # Sandviken station
+        print(f"Resor från mock-servern: {len(trips)}")
+        stops = resrobot.find_stops("Göteborg")
+        print(f"Hållplatser från mock-servern: {[stop.name for stop in stops]}")
+        print(f"Anrop till mock-servern (inkl. omförsök): {mock.requests_served}")
+
+    # Every request answered with 503: the client retries, then gives up.
+    with MockResRobot(error_rate=1.0) as mock:
+        resrobot = offline_client(mock)
+        data = resrobot.get_timetable(stop_id)
+        attempts = resrobot.transport.max_retries + 1
+        assert data is None, data
+        assert mock.requests_served == attempts, mock.requests_served
+        print(f"503 besvarades med {mock.requests_served} försök")
+
+
+if __name__ == "__main__":
+    main()
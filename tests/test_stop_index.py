@@ -0,0 +1,42 @@
+import time
+
+from backend.models import StopLocation
+from backend.stop_index import StopIndex
+from utils.constants import STOP_LIST_PATH
+
+
+def check_substring_matches():
+    """A query inside a word must match like `fuzz.partial_ratio` does."""
+    names = ["Stationsgatan", "Göteborg Centralstation", "Västra Centralstation"]
+    stops = [StopLocation(str(i), name, 57.7, 11.9) for i, name in enumerate(names)]
+    index = StopIndex(stops + [StopLocation("9", "Lilla Bommen", 57.7, 11.9)])
+    found = {stop.name for stop in index.search("stat")}
+    assert found == set(names), found
+    print("Delsträngar inuti ord matchas: OK")
+
+
+def main():
+    check_substring_matches()
+
+    # The stop list is GTFS Sverige 2's stops.txt from Trafiklab.
+    if not STOP_LIST_PATH.exists():
+        print(f"Ingen hållplatslista hittades i {STOP_LIST_PATH}, ladda ner den först.")
+        return
+
+    index = StopIndex.from_gtfs(STOP_LIST_PATH)
+    print(f"Hållplatser i indexet: {len(index)}")
+
+    for query in ["Göteborg Centralstation", "goteborg c", "Malmo", "götebrg", "st"]:
+        start = time.perf_counter()
+        matches = index.search(query)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"\n{query!r} ({elapsed:.2f} ms):")
+        for stop in matches[:3]:
+            print(stop)
+
+    print("\nHållplats 740000002 (get):")
+    print(index.get(740000002))
+
+
+if __name__ == "__main__":
+    main()
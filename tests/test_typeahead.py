@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+from backend.models import StopLocation
+from backend.stop_index import StopIndex
+from backend.typeahead import Typeahead
+
+
+def main():
+    names = [
+        "Stationsgatan",
+        "Stationsvägen",
+        "Centralstation Nord",
+        "Västra Centralstation",
+        "Göteborg Centralstation",
+        "Statarvägen",
+        "Lilla Bommen",
+    ]
+    index = StopIndex(
+        [StopLocation(str(i), name, 57.7, 11.9) for i, name in enumerate(names)]
+    )
+    typeahead = Typeahead(SimpleNamespace(index=index))
+
+    # Typing a query letter by letter, and going back over it, must give the
+    # same results as a fresh search for every prefix.
+    query = "station"
+    keystrokes = [query[:n] for n in range(1, len(query) + 1)]
+    keystrokes += keystrokes[::-1] + keystrokes
+    for text in keystrokes:
+        typed = [stop.name for stop in typeahead.search(text)]
+        fresh = [stop.name for stop in index.search(text, limit=typeahead.limit)]
+        assert typed == fresh, (text, typed, fresh)
+        print(f"{text!r}: {typed}")
+    print("Stegvis sökning ger samma resultat som en ny sökning: OK")
+
+    # Narrowing the previous keystroke's candidates by hand must agree too,
+    # also for a name that only reaches the threshold with the longer query.
+    candidates = None
+    for text in ["sta", "stat", "stata", "statarv", "statarvagen"]:
+        narrowed, candidates = index.narrow(text, candidates)
+        assert narrowed == index.search(text), text
+    print("Avsmalnade kandidater ger samma resultat: OK")
+
+
+if __name__ == "__main__":
+    main()
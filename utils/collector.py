@@ -0,0 +1,155 @@
+"""
+Collects the departure and arrival boards of a list of stations into the
+local event store, so the Data tab can show whole days although the API
+only keeps the last few hours.
+
+Each poll reads the boards from `lookback` minutes ago to `lookahead`
+minutes ahead, so every event is seen both before and after it happens and
+its final realtime state is stored.
+
+Example:
+    collector --stations 740000001 740000002 --interval 300
+    collector --once  # stations from data/stations.txt, one id per line
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from backend.connect_to_api import ResRobot
+from backend.event_store import EventStore
+from backend.models import parse_arrivals, parse_departures
+from backend.queries import board_params
+from backend.rate_limit import BACKGROUND
+from utils.constants import COLLECTOR_STATIONS_PATH, EVENT_STORE_PATH
+
+BOARDS = {
+    "departure": ("departureBoard", parse_departures),
+    "arrival": ("arrivalBoard", parse_arrivals),
+}
+
+
+def read_stations(path) -> list[str]:
+    """Station ids from a file with one id per line; `#` starts a comment."""
+    with open(path, encoding="utf-8") as file:
+        lines = (line.split("#")[0].strip() for line in file)
+        return [line for line in lines if line]
+
+
+class BoardCollector:
+    """
+    Polls the boards of a set of stations into an `EventStore`.
+
+    Features:
+    - The boards of a poll are fetched concurrently at background priority,
+      in batches of what the rate limiter allows right now, waiting for
+      the bucket to refill in between, so no board is shed.
+    - Only new and changed events are written, and the planned times each
+      board poll covered are recorded with `EventStore.record_poll`.
+    - A failed request skips that board until the next poll, which fetches
+      it first.
+    """
+
+    def __init__(
+        self, resrobot, store: EventStore, stations, lookback=30, lookahead=30
+    ):
+        self.resrobot = resrobot
+        self.store = store
+        self.stations = [str(station) for station in stations]
+        self.lookback = lookback
+        self.lookahead = lookahead
+        self._skipped = []
+
+    def _batch_size(self) -> int:
+        """Boards the next batch may fetch, after waiting for a refill."""
+        limiter = self.resrobot.limiter
+        while True:
+            size = limiter.available(BACKGROUND)
+            if size > 0:
+                return size
+            time.sleep(60.0 / limiter.per_minute)
+
+    def collect_once(self, now=None) -> int:
+        """Polls every board once. Returns the number of events written."""
+        now = now or datetime.now()
+        start = (now - timedelta(minutes=self.lookback)).replace(
+            second=0, microsecond=0
+        )
+        end = start + timedelta(minutes=self.lookback + self.lookahead)
+        boards = [(board, station) for station in self.stations for board in BOARDS]
+        # The boards the last poll skipped go first.
+        skipped = [board for board in self._skipped if board in boards]
+        pending = skipped + [board for board in boards if board not in skipped]
+        self._skipped = []
+
+        aio = self.resrobot.aio
+        written = 0
+        while pending:
+            size = self._batch_size()
+            batch, pending = pending[:size], pending[size:]
+            responses = self.resrobot.gather(
+                *(
+                    aio.fetch(
+                        BOARDS[board][0],
+                        board_params(
+                            station,
+                            date=start.strftime("%Y-%m-%d"),
+                            time=start.strftime("%H:%M"),
+                            duration=self.lookback + self.lookahead,
+                        ),
+                        priority=BACKGROUND,
+                    )
+                    for board, station in batch
+                )
+            )
+            for (board, station), data in zip(batch, responses):
+                if data is None:
+                    print(f"Hoppar över {board} för {station}: ingen data")
+                    self._skipped.append((board, station))
+                    continue
+                written += self.store.append(
+                    board, station, BOARDS[board][1](data), now
+                )
+                self.store.record_poll(board, station, start, end)
+        return written
+
+    def run(self, interval=300):
+        """Polls every `interval` seconds until interrupted."""
+        while True:
+            began = time.monotonic()
+            written = self.collect_once()
+            print(f"{datetime.now():%H:%M:%S} sparade {written} händelser")
+            time.sleep(max(0.0, interval - (time.monotonic() - began)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collect ResRobot boards to disk")
+    parser.add_argument("--stations", nargs="*", help="station ids to poll")
+    parser.add_argument("--stations-file", default=str(COLLECTOR_STATIONS_PATH))
+    parser.add_argument("--store", default=str(EVENT_STORE_PATH))
+    parser.add_argument("--interval", type=float, default=300)
+    parser.add_argument("--lookback", type=int, default=30)
+    parser.add_argument("--lookahead", type=int, default=30)
+    parser.add_argument("--once", action="store_true")
+    args = parser.parse_args()
+
+    stations = args.stations or read_stations(args.stations_file)
+    collector = BoardCollector(
+        ResRobot(),
+        EventStore(args.store),
+        stations,
+        lookback=args.lookback,
+        lookahead=args.lookahead,
+    )
+    print(f"Samlar in tavlor för {len(stations)} stationer till {args.store}")
+    if args.once:
+        print(f"Sparade {collector.collect_once()} händelser")
+    else:
+        try:
+            collector.run(args.interval)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
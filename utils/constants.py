@@ -5,3 +5,10 @@ ROOT_PATH = Path(__file__).parents[1]
 FRONTEND_PATH = ROOT_PATH / "frontend"
 BACKEND_PATH = ROOT_PATH / "backend"
 CSS_PATH = FRONTEND_PATH / "styles.css"
+CACHE_PATH = ROOT_PATH / ".cache" / "resrobot.sqlite"
+QUOTA_PATH = ROOT_PATH / ".cache" / "quota.json"
+STOP_STORE_PATH = ROOT_PATH / ".cache" / "stops.sqlite"
+FIXTURES_PATH = ROOT_PATH / "tests" / "fixtures"
+STOP_LIST_PATH = ROOT_PATH / "data" / "stops.txt"
+EVENT_STORE_PATH = ROOT_PATH / "data" / "events"
+COLLECTOR_STATIONS_PATH = ROOT_PATH / "data" / "stations.txt"
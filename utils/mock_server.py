@@ -0,0 +1,229 @@
+"""
+A local stand-in for the ResRobot API, for reproducible offline runs of the
+test scripts, benchmarks and load tests.
+
+Modes:
+- record: forwards every request to the real API and saves the response as a
+  fixture file. The access key of the request is passed on but never stored.
+- replay: answers from the fixture files only, with optional injected latency
+  and error rate.
+
+Example:
+    python -m utils.mock_server --mode record --port 8765
+    RESROBOT_BASE_URL=http://127.0.0.1:8765/v2.1 python -m tests.test_trips
+    python -m utils.mock_server --mode replay --latency-ms 80 --error-rate 0.05
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+
+from backend.cache import cache_key
+from utils.constants import FIXTURES_PATH
+
+UPSTREAM_URL = "https://api.resrobot.se/v2.1"
+
+ENDPOINTS = frozenset(
+    {
+        "trip",
+        "journeyDetail",
+        "location.name",
+        "departureBoard",
+        "arrivalBoard",
+        "location.nearbystops",
+    }
+)
+
+
+def fixture_path(fixtures_dir, endpoint: str, params: dict):
+    """Fixture file for a request, named after a hash of its cache key."""
+    digest = hashlib.sha1(cache_key(endpoint, params).encode("utf-8")).hexdigest()
+    return fixtures_dir / endpoint / f"{digest[:16]}.json"
+
+
+class MockResRobot:
+    """
+    Local HTTP server implementing the ResRobot endpoints used by the app.
+
+    Features:
+    - Serves /v2.1/trip, /journeyDetail, /location.name, /departureBoard,
+      /arrivalBoard and /location.nearbystops.
+    - Record mode capturing real responses to fixture files.
+    - Replay mode with configurable latency, jitter and error rate.
+    - With `loose=True`, replay falls back to any fixture of the same
+      endpoint when the exact request was never recorded, which lets load
+      tests send arbitrary stop ids.
+
+    Use it as a context manager in scripts; `base_url` is what to pass to
+    `ResRobot(base_url=...)`.
+    """
+
+    def __init__(
+        self,
+        fixtures_dir=FIXTURES_PATH,
+        mode="replay",
+        host="127.0.0.1",
+        port=0,
+        latency_ms=0,
+        jitter_ms=0,
+        error_rate=0.0,
+        loose=False,
+        upstream_url=UPSTREAM_URL,
+    ):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown mode: {mode}")
+
+        self.fixtures_dir = Path(fixtures_dir)
+        self.mode = mode
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.loose = loose
+        self.upstream_url = upstream_url.rstrip("/")
+        self.requests_served = 0
+
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v2.1"
+
+    def _handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                mock._handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def _handle(self, handler):
+        self.requests_served += 1
+        url = urlsplit(handler.path)
+        endpoint = url.path.rsplit("/", 1)[-1]
+        params = dict(parse_qsl(url.query))
+
+        if endpoint not in ENDPOINTS:
+            return self._send(handler, 404, {"errorCode": "SVC_NO_ENDPOINT"})
+
+        if self.mode == "record":
+            return self._record(handler, endpoint, params)
+
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+        if random.random() < self.error_rate:
+            return self._send(handler, 503, {"errorCode": "SVC_UNAVAILABLE"})
+
+        body = self._load(endpoint, params)
+        if body is None:
+            return self._send(handler, 404, {"errorCode": "SVC_NO_FIXTURE"})
+        self._send(handler, 200, body)
+
+    def _record(self, handler, endpoint, params):
+        try:
+            response = requests.get(
+                f"{self.upstream_url}/{endpoint}", params=params, timeout=(3.05, 30)
+            )
+        except requests.exceptions.RequestException as err:
+            return self._send(
+                handler, 502, {"errorCode": "SVC_UPSTREAM", "error": str(err)}
+            )
+
+        if response.status_code != 200:
+            return self._send(handler, response.status_code, response.json())
+
+        body = response.json()
+        path = fixture_path(self.fixtures_dir, endpoint, params)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fixture = {"request": cache_key(endpoint, params), "response": body}
+        path.write_text(json.dumps(fixture, ensure_ascii=False), encoding="utf-8")
+        self._send(handler, 200, body)
+
+    def _load(self, endpoint, params):
+        path = fixture_path(self.fixtures_dir, endpoint, params)
+        if not path.exists() and self.loose:
+            candidates = sorted((self.fixtures_dir / endpoint).glob("*.json"))
+            path = candidates[0] if candidates else path
+        if not path.exists():
+            return None
+        return json.loads(path.read_text(encoding="utf-8"))["response"]
+
+    def _send(self, handler, status, body):
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json; charset=utf-8")
+        handler.send_header("Content-Length", str(len(payload)))
+        if status == 503:
+            handler.send_header("Retry-After", "0")
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Serves in the calling thread until interrupted."""
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local ResRobot stand-in server")
+    parser.add_argument("--mode", choices=["record", "replay"], default="replay")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", default=str(FIXTURES_PATH))
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--loose", action="store_true")
+    args = parser.parse_args()
+
+    mock = MockResRobot(
+        fixtures_dir=args.fixtures,
+        mode=args.mode,
+        host=args.host,
+        port=args.port,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        loose=args.loose,
+    )
+    print(f"Mock ResRobot ({args.mode}) listening on {mock.base_url}")
+    mock.serve_forever()
+
+
+if __name__ == "__main__":
+    main()